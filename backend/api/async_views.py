@@ -0,0 +1,115 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections, connections
+from django.urls import URLPattern
+
+from api.connections import check_connections
+
+# методы, которые обёртка отдаёт общему пулу потоков
+ASYNC_METHODS = ('GET', 'HEAD')
+
+
+def async_view(view):
+    """Выполняет чтение в пуле потоков, не занимая цикл событий.
+
+    В Django 3.2 нет асинхронного ORM, а синхронные вьюхи под ASGI
+    выполняются по очереди в одном потоке процесса. Обёртка отдаёт
+    GET и HEAD общему пулу (thread_sensitive=False), поэтому медленные
+    запросы не задерживают остальные. Ответ отрисовывается там же,
+    соединения с базой потоков пула закрываются и проверяются так же,
+    как у обычного запроса. Остальные методы выполняются в общем потоке,
+    как любая синхронная вьюха.
+    """
+
+    def run(request, *args, **kwargs):
+        close_old_connections()
+        check_connections()
+        try:
+            response = view(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response = response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    run = sync_to_async(run, thread_sensitive=False)
+    run_sync = sync_to_async(view)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in ASYNC_METHODS:
+            return await run(request, *args, **kwargs)
+        return await run_sync(request, *args, **kwargs)
+
+    return wrapper
+
+
+def async_routes(urlpatterns, names):
+    """В режиме ASGI делает асинхронными маршруты с именами из names."""
+    if settings.SERVER_MODE != 'asgi':
+        return urlpatterns
+    return [
+        URLPattern(
+            url.pattern, async_view(url.callback), url.default_args,
+            url.name)
+        if isinstance(url, URLPattern) and url.name in names else url
+        for url in urlpatterns]
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """Отдаёт потоковые ответы, не читая их в цикле событий.
+
+    Django 3.2 перебирает тело потокового ответа прямо в цикле событий,
+    где запросы к базе запрещены, а сам перебор блокирует остальные
+    запросы. Здесь части тела берутся в отдельном потоке ответа: курсор
+    базы остаётся в одном потоке, а цикл событий ждёт только готовую часть.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        response_headers = [
+            (header.encode('ascii') if isinstance(header, str) else header,
+             value.encode('latin1') if isinstance(value, str) else value)
+            for header, value in response.items()]
+        for cookie in response.cookies.values():
+            response_headers.append((
+                b'Set-Cookie',
+                cookie.output(header='').encode('ascii').strip()))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': response_headers,
+        })
+        loop = asyncio.get_running_loop()
+        end = object()
+        parts = iter(response)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            try:
+                while True:
+                    part = await loop.run_in_executor(
+                        executor, next, parts, end)
+                    if part is end:
+                        break
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send({
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True,
+                        })
+                await send({'type': 'http.response.body'})
+            finally:
+                await loop.run_in_executor(executor, self.close, response)
+
+    @staticmethod
+    def close(response):
+        """Закрывает ответ и соединения с базой потока ответа."""
+        try:
+            response.close()
+        finally:
+            connections.close_all()
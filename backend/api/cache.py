@@ -0,0 +1,138 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipes.models import Tag
+
+VERSION_KEY = 'reference:{name}:version'
+ENTRY_KEY = 'reference:{name}:{version}:{format}:{path}'
+TAG_IDS_KEY = 'reference:tags:{version}:ids'
+
+_local_entries = OrderedDict()
+_local_lock = Lock()
+
+
+def get_version(name):
+    """Текущая версия справочника, общая для всех процессов."""
+    key = VERSION_KEY.format(name=name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """Делает недействительными все закэшированные ответы справочника."""
+    key = VERSION_KEY.format(name=name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def get_entry(key):
+    with _local_lock:
+        entry = _local_entries.get(key)
+        if entry is not None:
+            _local_entries.move_to_end(key)
+            return entry
+    entry = cache.get(key)
+    if entry is not None:
+        set_local_entry(key, entry)
+    return entry
+
+
+def set_local_entry(key, entry):
+    with _local_lock:
+        _local_entries[key] = entry
+        _local_entries.move_to_end(key)
+        while len(_local_entries) > settings.REFERENCE_CACHE_LOCAL_SIZE:
+            _local_entries.popitem(last=False)
+
+
+def set_entry(key, entry):
+    cache.set(key, entry, timeout=settings.REFERENCE_CACHE_TIMEOUT)
+    set_local_entry(key, entry)
+
+
+def tag_ids_by_slug(refresh=False):
+    """Id тегов по slug, кэшируются вместе с ответами справочника тегов."""
+    key = TAG_IDS_KEY.format(version=get_version('tags'))
+    tag_ids = None if refresh else get_entry(key)
+    if tag_ids is None:
+        tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        set_entry(key, tag_ids)
+    return tag_ids
+
+
+def tag_id(slug):
+    """Id тега по slug или None.
+
+    Кэш процесса может отстать от тегов, добавленных в другом процессе,
+    поэтому при промахе теги перечитываются из базы.
+    """
+    tag_ids = tag_ids_by_slug()
+    if slug not in tag_ids:
+        tag_ids = tag_ids_by_slug(refresh=True)
+    return tag_ids.get(slug)
+
+
+def tag_choices():
+    return [(slug, slug) for slug in tag_ids_by_slug()]
+
+
+class CachedReferenceMixin:
+    """Кэширует ответы вьюсета справочника и отвечает 304 по ETag.
+
+    Кэш сбрасывается сменой версии справочника cache_name
+    из сигналов сохранения и удаления его моделей.
+    """
+
+    cache_name = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, *args, **kwargs)
+
+    def cached_response(self, request, build, *args, **kwargs):
+        key = ENTRY_KEY.format(
+            name=self.cache_name,
+            version=get_version(self.cache_name),
+            format=request.accepted_renderer.format,
+            path=request.get_full_path())
+        entry = get_entry(key)
+        if entry is None:
+            response = build(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            payload = json.dumps(
+                response.data, ensure_ascii=False, sort_keys=True)
+            etag = '"{}"'.format(hashlib.sha256(
+                f'{request.accepted_renderer.format}:{payload}'.encode()
+            ).hexdigest()[:32])
+            entry = (etag, response.data)
+            set_entry(key, entry)
+        etag, data = entry
+        if_none_match = parse_etags(
+            request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import connections
+
+
+def check_connections():
+    """Закрывает постоянные соединения, которые перестали отвечать.
+
+    Django 3.2 проверяет соединение только после ошибки в нём, поэтому
+    соединение, закрытое базой или PgBouncer между запросами, иначе
+    обернулось бы ошибкой первого запроса. Проверка - один SELECT 1.
+    """
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if (connection.connection is not None
+                and not connection.in_atomic_block
+                and not connection.is_usable()):
+            connection.close()
+
+
+def set_statement_timeout(connection):
+    """Ограничивает время запросов нового соединения.
+
+    SET действует на всю сессию сервера, а PgBouncer в режиме
+    transaction отдаёт её следующим клиентам, поэтому через него
+    ограничение не выставляется: его нужно задать роли в базе.
+    """
+    if settings.DB_PGBOUNCER:
+        return
+    if settings.DB_STATEMENT_TIMEOUT and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SET statement_timeout TO %s',
+                [settings.DB_STATEMENT_TIMEOUT])
@@ -10,3 +10,93 @@ MAX_NAME_ING_LENGTH = 128
 MAX_UNIT_ING_LENGTH = 64
 MAX_NAME_LENGTH = 256
 MIN_VALUE_VALID = 1
+
+# константы рейтинга рецептов
+FAVORITE_WEIGHT = 1.0
+SHOPPING_CART_WEIGHT = 1.5
+TRENDING_HALF_LIFE = 7 * 24 * 60 * 60
+RATING_ORDERINGS = (
+    ('popular', 'По популярности'),
+    ('trending', 'По популярности с учётом давности'),
+)
+
+# константы загрузки изображений
+BASE64_CHUNK_SIZE = 64 * 1024
+IMAGE_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_MAX_SIDE = 5000
+IMAGE_SPOOL_SIZE = 1024 * 1024
+# допустимые форматы загружаемых изображений и их расширения
+IMAGE_FORMATS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+# вариант изображения: наибольшая сторона, None - исходный размер
+IMAGE_VARIANTS = {
+    'thumbnail': 400,
+    'webp': None,
+}
+
+# константы автодополнения ингредиентов
+TRIGRAM_MIN_LENGTH = 3
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+# константы полнотекстового поиска
+SEARCH_CONFIG = 'russian'
+
+# константы фильтра по тегам
+TAG_MODES = (
+    ('any', 'Есть хотя бы один тег'),
+    ('all', 'Есть все теги'))
+DEFAULT_TAG_MODE = 'any'
+
+# константы подбора рецептов по ингредиентам
+INGREDIENT_MODES = (
+    ('all', 'Есть все ингредиенты'),
+    ('any', 'Есть хотя бы один ингредиент'),
+    ('only', 'Не хватает не больше missing ингредиентов'))
+DEFAULT_INGREDIENT_MODE = 'only'
+
+# константы массовых операций со списками рецептов
+MAX_BULK_RECIPES = 100
+
+# константы выгрузки списка покупок
+SHOPPING_CART_CHUNK_SIZE = 500
+SHOPPING_CART_PRECISION = 2
+# единица измерения: (каноническая единица, множитель)
+UNIT_CONVERSIONS = {
+    'гр': ('г', 1),
+    'гр.': ('г', 1),
+    'кг': ('г', 1000),
+    'мг': ('г', 0.001),
+    'мл.': ('мл', 1),
+    'л': ('мл', 1000),
+    'ч. л.': ('мл', 5),
+    'ст. л.': ('мл', 15),
+    'стакан': ('мл', 250),
+    'шт': ('шт.', 1),
+}
+# каноническая единица: (крупная единица, с какого количества)
+UNIT_DISPLAY = {
+    'г': ('кг', 1000),
+    'мл': ('л', 1000),
+}
+
+# константы коротких ссылок
+SHORT_LINK_ALPHABET = (
+    '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ')
+SHORT_LINK_LENGTH = 7
+# взаимно простой с 62 ** SHORT_LINK_LENGTH множитель, перемешивает id
+SHORT_LINK_MULTIPLIER = 3141592653
+
+# константы метрик запросов
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+SLOW_REQUEST_TOP_QUERIES = 5
+
+# константы пагинации
+PAGINATION_MODE_PARAM = 'pagination'
+CURSOR_PAGINATION_VALUE = 'cursor'
+MAX_PAGE_SIZE = 100
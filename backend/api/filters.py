@@ -1,7 +1,19 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django_filters import fields
 from django_filters import rest_framework as filters
 from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe, Tag
+from api.cache import tag_choices, tag_id
+from api.constants import (
+    DEFAULT_INGREDIENT_MODE,
+    DEFAULT_TAG_MODE,
+    INGREDIENT_MODES,
+    RATING_ORDERINGS,
+    SEARCH_CONFIG,
+    TAG_MODES)
+from recipes.models import Recipe
 from users.models import User
 
 
@@ -9,6 +21,21 @@ class IngredientFilter(SearchFilter):
     search_param = 'name'
 
 
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
+class TagSlugField(fields.MultipleChoiceField):
+    """Slug проверяется по тегам в базе, а не только по кэшу выбора."""
+
+    def valid_value(self, value):
+        return tag_id(value) is not None
+
+
+class TagsFilter(filters.MultipleChoiceFilter):
+    field_class = TagSlugField
+
+
 class RecipesFilter(filters.FilterSet):
     author = filters.ModelChoiceFilter(
         queryset=User.objects.all()
@@ -19,10 +46,31 @@ class RecipesFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart',
     )
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        queryset=Tag.objects.all(),
-        to_field_name='slug',
+    tags = TagsFilter(
+        choices=tag_choices,
+        method='get_by_tags',
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=TAG_MODES,
+        method='filter_options',
+    )
+    ingredients = NumberInFilter(
+        method='get_by_ingredients',
+    )
+    ingredients_mode = filters.ChoiceFilter(
+        choices=INGREDIENT_MODES,
+        method='filter_options',
+    )
+    missing = filters.NumberFilter(
+        min_value=0,
+        method='filter_options',
+    )
+    search = filters.CharFilter(
+        method='search_recipes',
+    )
+    ordering = filters.ChoiceFilter(
+        choices=RATING_ORDERINGS,
+        method='order_by_rating',
     )
 
     def get_is_favorited(self, queryset, filter_name, filter_value):
@@ -35,6 +83,48 @@ class RecipesFilter(filters.FilterSet):
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset
 
+    def get_by_tags(self, queryset, filter_name, filter_value):
+        return queryset.with_tags(
+            [tag_id(slug) for slug in filter_value],
+            self.form.cleaned_data.get('tags_mode') or DEFAULT_TAG_MODE)
+
+    def get_by_ingredients(self, queryset, filter_name, filter_value):
+        return queryset.with_ingredients(
+            [int(value) for value in filter_value],
+            self.form.cleaned_data.get('ingredients_mode')
+            or DEFAULT_INGREDIENT_MODE,
+            int(self.form.cleaned_data.get('missing') or 0))
+
+    def filter_options(self, queryset, filter_name, filter_value):
+        """Режимы учитываются в get_by_tags и get_by_ingredients."""
+        return queryset
+
+    def search_recipes(self, queryset, filter_name, filter_value):
+        query = SearchQuery(
+            filter_value, config=SEARCH_CONFIG, search_type='websearch')
+        # ts_rank возвращает real, значение из курсора сравнивается
+        # с ним точно только после приведения к double precision
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=Cast(
+                SearchRank(F('search_vector'), query), FloatField())
+        ).order_by(
+            '-search_rank', '-pub_date', '-id')
+
+    def order_by_rating(self, queryset, filter_name, filter_value):
+        return queryset.filter(rating__isnull=False).annotate(
+            rating_score=F(f'rating__{filter_value}_score')).order_by(
+            '-rating_score', '-pub_date', '-id')
+
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_in_shopping_cart', 'is_favorited']
+        fields = [
+            'author',
+            'tags',
+            'tags_mode',
+            'is_in_shopping_cart',
+            'is_favorited',
+            'ingredients',
+            'ingredients_mode',
+            'missing',
+            'search',
+            'ordering']
@@ -0,0 +1,88 @@
+import os
+import re
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from threading import Lock
+
+from api.constants import LATENCY_BUCKETS_MS, QUERY_COUNT_BUCKETS
+
+FINGERPRINT_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\((?:\s*(?:\?|%s)\s*,?)+\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+_views = defaultdict(lambda: {
+    'requests': 0,
+    'queries': 0,
+    'db_ms': 0.0,
+    'total_ms': 0.0,
+    'latency': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+    'query_count': [0] * (len(QUERY_COUNT_BUCKETS) + 1),
+})
+_views_lock = Lock()
+
+
+def fingerprint(sql):
+    """SQL без значений параметров: одинаков для повторов N+1."""
+    for pattern, replacement in FINGERPRINT_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryRecorder:
+    """Считает запросы и их время через connection.execute_wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+
+def record(view, queries, db_ms, total_ms):
+    with _views_lock:
+        stats = _views[view]
+        stats['requests'] += 1
+        stats['queries'] += queries
+        stats['db_ms'] += db_ms
+        stats['total_ms'] += total_ms
+        stats['latency'][bisect_left(LATENCY_BUCKETS_MS, total_ms)] += 1
+        stats['query_count'][bisect_left(QUERY_COUNT_BUCKETS, queries)] += 1
+
+
+def histogram(buckets, counts):
+    return {
+        **{f'<={bound}': count for bound, count in zip(buckets, counts)},
+        f'>{buckets[-1]}': counts[-1],
+    }
+
+
+def snapshot():
+    """Накопленная процессом статистика по вьюхам."""
+    with _views_lock:
+        views = {
+            view: {
+                'requests': stats['requests'],
+                'avg_queries': round(
+                    stats['queries'] / stats['requests'], 2),
+                'avg_db_ms': round(stats['db_ms'] / stats['requests'], 2),
+                'avg_total_ms': round(
+                    stats['total_ms'] / stats['requests'], 2),
+                'latency_ms': histogram(
+                    LATENCY_BUCKETS_MS, stats['latency']),
+                'queries': histogram(
+                    QUERY_COUNT_BUCKETS, stats['query_count']),
+            }
+            for view, stats in sorted(_views.items())}
+    return {'pid': os.getpid(), 'views': views}
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import re
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils.decorators import sync_and_async_middleware
+
+from api.constants import SLOW_REQUEST_TOP_QUERIES
+from api.metrics import QueryRecorder, record
+from api.short_links import (
+    async_short_link_redirect,
+    short_link_redirect)
+
+SHORT_LINK_PATH = re.compile(r'^/s/(?P<code>[0-9A-Za-z]+)/?$')
+# имя маршрута коротких ссылок: ответы middleware и вьюхи в одной строке
+SHORT_LINK_VIEW = 'get_short_link'
+
+logger = logging.getLogger(__name__)
+
+
+class QueryInstrumentationMiddleware:
+    """Замеряет число SQL-запросов, время БД и время ответа.
+
+    Включается переменной окружения REQUEST_METRICS. Время вьюхи без
+    БД (app) - в основном работа сериализаторов, render - отрисовка
+    ответа. Тело потоковых ответов отдаётся после замера.
+
+    Запросы считаются в потоке middleware, поэтому в режиме ASGI,
+    где вьюхи выполняются в пуле потоков, замеры отключены.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        if settings.SERVER_MODE == 'asgi':
+            logger.warning('REQUEST_METRICS не поддерживается в режиме ASGI')
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request.query_recorder = recorder
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        finish = time.perf_counter()
+        total_ms = (finish - start) * 1000
+        db_ms = recorder.duration * 1000
+        # short_link_middleware отвечает до разбора URL
+        view = getattr(request, 'metrics_view', None) or (
+            request.resolver_match.view_name
+            if request.resolver_match else 'unresolved')
+        record(f'{request.method} {view}', recorder.count, db_ms, total_ms)
+        timings = [f'db;dur={db_ms:.1f};desc="{recorder.count} SQL"']
+        view_start = getattr(request, 'view_started', None)
+        view_end = getattr(request, 'view_finished', None)
+        if view_start and view_end:
+            app_ms = (
+                (view_end[0] - view_start[0])
+                - (view_end[1] - view_start[1])) * 1000
+            render_ms = (
+                (finish - view_end[0])
+                - (recorder.duration - view_end[1])) * 1000
+            timings.append(f'app;dur={app_ms:.1f}')
+            timings.append(f'render;dur={render_ms:.1f}')
+        timings.append(f'total;dur={total_ms:.1f}')
+        response['Server-Timing'] = ', '.join(timings)
+        if total_ms >= settings.SLOW_REQUEST_MS:
+            logger.warning(
+                'Медленный запрос %s %s: %.0f мс, SQL: %d за %.0f мс\n%s',
+                request.method, request.get_full_path(), total_ms,
+                recorder.count, db_ms,
+                '\n'.join(
+                    f'{count} x {sql}' for sql, count in
+                    recorder.fingerprints.most_common(
+                        SLOW_REQUEST_TOP_QUERIES)))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.view_started = (
+            time.perf_counter(), request.query_recorder.duration)
+
+    def process_template_response(self, request, response):
+        request.view_finished = (
+            time.perf_counter(), request.query_recorder.duration)
+        return response
+
+
+@sync_and_async_middleware
+def short_link_middleware(get_response):
+    """Отвечает на короткие ссылки, не доходя до остальных middleware.
+
+    Переходу по ссылке не нужны сессии, CSRF и сообщения,
+    поэтому middleware стоит в начале списка.
+    """
+
+    def short_link_code(request):
+        match = SHORT_LINK_PATH.match(request.path_info)
+        if match and request.method in ('GET', 'HEAD'):
+            request.metrics_view = SHORT_LINK_VIEW
+            return match['code']
+        return None
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            code = short_link_code(request)
+            if code:
+                return await async_short_link_redirect(request, code)
+            return await get_response(request)
+    else:
+        def middleware(request):
+            code = short_link_code(request)
+            if code:
+                return short_link_redirect(request, code)
+            return get_response(request)
+    return middleware
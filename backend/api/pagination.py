@@ -0,0 +1,129 @@
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+from api.constants import (
+    CURSOR_PAGINATION_VALUE,
+    MAX_PAGE_SIZE,
+    PAGINATION_MODE_PARAM
+)
+
+
+def reverse_ordering(ordering):
+    return tuple(
+        field[1:] if field.startswith('-') else f'-{field}'
+        for field in ordering)
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Постраничный вывод рецептов по ключу сортировки без COUNT.
+
+    DRF строит курсор только по первому полю сортировки, поэтому
+    порядок по рейтингу, релевантности поиска или подбору по
+    ингредиентам заменялся бы на ordering. Здесь сортировка берётся
+    из запроса, который её задал фильтр, а курсор хранит значения всех
+    её полей. Поля должны быть полями или аннотациями рецепта, последнее
+    из них - уникальный id, поэтому смещение в курсоре не нужно.
+    """
+
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(queryset.query.order_by) or self.ordering
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering += ('-id',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse, position = False, None
+        if self.cursor is not None:
+            _, reverse, position = self.cursor
+        ordering = (
+            reverse_ordering(self.ordering) if reverse else self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > len(self.page):
+            following = self._get_position_from_instance(
+                results[-1], self.ordering)
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = following is not None
+            self.next_position = position
+            self.previous_position = following
+        else:
+            self.has_next = following is not None
+            self.has_previous = position is not None
+            self.next_position = following
+            self.previous_position = position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def after(self, ordering, position):
+        """Условие «строго после позиции» для сортировки ordering."""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        condition, equal = Q(), {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            value = getattr(instance, field.lstrip('-'))
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            values.append(value)
+        return json.dumps(values)
+
+
+class SubscriptionCursorPagination(CursorPagination):
+    """Постраничный вывод подписок по ключу id без COUNT."""
+
+    ordering = ('-id',)
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class CursorPaginationMixin:
+    """Включает курсорную пагинацию по параметру ?pagination=cursor.
+
+    Без параметра используется обычная пагинация вьюсета.
+    """
+
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            mode = self.request.query_params.get(PAGINATION_MODE_PARAM)
+            if (self.cursor_pagination_class is not None
+                    and mode == CURSOR_PAGINATION_VALUE):
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
@@ -1,30 +1,53 @@
-import base64
+from collections import Counter
 
-from django.core.files.base import ContentFile
+from django.db import transaction
 from djoser.serializers import UserSerializer, UserCreateSerializer
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
+from api.constants import MAX_BULK_RECIPES
 from recipes.models import (
     Ingredient,
     IngredientInRecipe,
     Favorite,
     Recipe,
     ShoppingCart,
+    ShoppingListItem,
     Tag
 )
+from recipes.images import decode_base64_image, variant_urls
 from users.models import Subscription, User
 
 
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            try:
+                data = decode_base64_image(data)
+            except ValueError as error:
+                raise serializers.ValidationError(str(error))
         return super().to_internal_value(data)
 
 
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии изображения рецепта."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', '*')
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        urls = variant_urls(recipe.image, recipe.has_image_variants)
+        request = self.context.get('request')
+        if request is None:
+            return urls
+        return {
+            variant: request.build_absolute_uri(url)
+            for variant, url in urls.items()}
+
+
 class UserSerializer(UserSerializer):
     """Сериализатор для просмотра пользователя."""
 
@@ -46,6 +69,8 @@ class UserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -86,6 +111,18 @@ class PasswordSerializer(serializers.Serializer):
     new_password = serializers.CharField()
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    """Сериализатор списка рецептов для массовых операций."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=MAX_BULK_RECIPES)
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+
 class SubscriptionSerializer(serializers.ModelSerializer):
     """Сериализатор для подписки на автора."""
 
@@ -109,19 +146,22 @@ class SubscriptionSerializer(serializers.ModelSerializer):
 class RecipeShortSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения рецептов в подписках пользователя."""
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time')
 
 
 class SubscriptionUserSerializer(UserSerializer):
     """Сериализатор для отображения подписок пользователя."""
 
-    recipes_count = serializers.ReadOnlyField(source='recipes.count')
+    recipes_count = serializers.ReadOnlyField()
     recipes = serializers.SerializerMethodField()
 
     class Meta:
@@ -147,11 +187,14 @@ class SubscriptionUserSerializer(UserSerializer):
             'recipes')
 
     def get_recipes(self, object):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = object.recipes.all()
-        if limit:
-            recipes = recipes[:int(limit)]
+        if hasattr(object, 'limited_recipes'):
+            recipes = object.limited_recipes
+        else:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            recipes = object.recipes.all()
+            if limit:
+                recipes = recipes[:int(limit)]
         serializer = RecipeShortSerializer(
             recipes,
             many=True,
@@ -193,11 +236,29 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
             'amount')
 
 
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    """Сериализатор для строк суммарного списка покупок."""
+
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit')
+    amount = serializers.ReadOnlyField(source='total')
+
+    class Meta:
+        model = ShoppingListItem
+        fields = (
+            'id',
+            'name',
+            'measurement_unit',
+            'amount')
+
+
 class IngredientInRecipeEditSerializer(serializers.ModelSerializer):
     """Cериализатор для связи ингредиентов
         с рецептом при работе с рецептами."""
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
 
     class Meta:
         model = IngredientInRecipe
@@ -218,14 +279,19 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField(required=False)
+    image_variants = ImageVariantsField()
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return request.user.is_authenticated and obj.favorites.filter(
             user=request.user,
             recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return request.user.is_authenticated and obj.shopping_cart.filter(
             user=request.user,
@@ -238,6 +304,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'ingredients',
             'tags',
             'image',
+            'image_variants',
             'name',
             'text',
             'cooking_time',
@@ -263,9 +330,7 @@ class RecipeEditSerializer(serializers.ModelSerializer):
     ingredients = IngredientInRecipeEditSerializer(
         many=True,
         source='ingredient_in_recipes')
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True)
+    tags = serializers.ListField(child=serializers.IntegerField())
     image = Base64ImageField(
         max_length=None,
         use_url=True)
@@ -289,6 +354,33 @@ class RecipeEditSerializer(serializers.ModelSerializer):
                     'Такой рецепт уже есть!')
         return value
 
+    def resolve_ids(self, model, ids, label):
+        """Загружает объекты одним запросом и сообщает обо всех ошибках."""
+        objects = model.objects.in_bulk(set(ids))
+        missing = sorted(set(ids) - objects.keys())
+        duplicates = sorted(
+            pk for pk, count in Counter(ids).items() if count > 1)
+        errors = []
+        if missing:
+            errors.append(
+                f'{label} не найдены: {", ".join(map(str, missing))}')
+        if duplicates:
+            errors.append(
+                f'{label} повторяются: {", ".join(map(str, duplicates))}')
+        if errors:
+            raise serializers.ValidationError(errors)
+        return objects
+
+    def validate_ingredients(self, value):
+        ingredients = self.resolve_ids(
+            Ingredient, [item['id'] for item in value], 'Ингредиенты')
+        return [
+            {**item, 'id': ingredients[item['id']]} for item in value]
+
+    def validate_tags(self, value):
+        tags = self.resolve_ids(Tag, value, 'Теги')
+        return [tags[pk] for pk in value]
+
     def create_ingredients(self, ingredients, recipe):
         ingredients = [
             IngredientInRecipe(
@@ -307,23 +399,70 @@ class RecipeEditSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(author=user, **validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
+        Recipe.objects.filter(pk=recipe.pk).update_search_fields()
         return recipe
 
+    def update_ingredients(self, ingredients, recipe):
+        """Меняет только добавленные, изменённые и удалённые ингредиенты.
+
+        Возвращает True, если изменился сам набор ингредиентов.
+        """
+        current = {
+            item.ingredient_id: item
+            for item in recipe.ingredient_in_recipes.all()}
+        created = []
+        changed = []
+        deltas = {}
+        for ingredient in ingredients:
+            item = current.pop(ingredient['id'].pk, None)
+            if item is None:
+                created.append(IngredientInRecipe(
+                    recipe=recipe,
+                    ingredient=ingredient['id'],
+                    amount=ingredient['amount']))
+                deltas[ingredient['id'].pk] = ingredient['amount']
+            elif item.amount != ingredient['amount']:
+                deltas[item.ingredient_id] = ingredient['amount'] - item.amount
+                item.amount = ingredient['amount']
+                changed.append(item)
+        for item in current.values():
+            deltas[item.ingredient_id] = -item.amount
+        ShoppingListItem.objects.change_recipe(recipe.pk, deltas)
+        if current:
+            IngredientInRecipe.objects.filter(
+                pk__in=[item.pk for item in current.values()]).delete()
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        if created:
+            IngredientInRecipe.objects.bulk_create(created)
+        return bool(created or current)
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients_data = validated_data.pop('ingredient_in_recipes')
-        tags_data = validated_data.pop('tags')
-        instance = super().update(instance, validated_data)
-        instance.tags.clear()
-        instance.tags.set(tags_data)
-        IngredientInRecipe.objects.filter(recipe=instance).delete()
-        self.create_ingredients(ingredients_data, instance)
-        instance.save()
+        ingredients_data = validated_data.pop('ingredient_in_recipes', None)
+        tags_data = validated_data.pop('tags', None)
+        changed_fields = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value]
+        for field in changed_fields:
+            setattr(instance, field, validated_data[field])
+        if changed_fields:
+            instance.save(update_fields=changed_fields)
+        if tags_data is not None:
+            instance.tags.set(tags_data)
+        ingredients_changed = ingredients_data is not None and (
+            self.update_ingredients(ingredients_data, instance))
+        if ingredients_changed or {'name', 'text'} & set(changed_fields):
+            Recipe.objects.filter(pk=instance.pk).update_search_fields()
         return instance
 
     def to_representation(self, instance):
+        request = self.context.get('request')
+        instance = Recipe.objects.with_related().with_user_flags(
+            request.user).get(pk=instance.pk)
         return RecipeReadSerializer(
             instance,
-            context={'request': self.context.get('request')}).data
+            context={'request': request}).data
 
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
@@ -0,0 +1,73 @@
+import csv
+import json
+
+from rest_framework.negotiation import DefaultContentNegotiation
+
+from api.constants import SHOPPING_CART_PRECISION, UNIT_DISPLAY
+
+
+class IgnoreFormatContentNegotiation(DefaultContentNegotiation):
+    """Согласование контента без учёта параметра ?format=.
+
+    Параметр занят выбором формата файла списка покупок,
+    поэтому DRF не должен искать по нему рендерер.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def display_items(items):
+    """Переводит большие количества в крупные единицы и округляет."""
+    for item in items:
+        amount, units = item['amount'], item['units']
+        if units in UNIT_DISPLAY:
+            large_units, threshold = UNIT_DISPLAY[units]
+            if amount >= threshold:
+                amount, units = amount / threshold, large_units
+        amount = round(amount, SHOPPING_CART_PRECISION)
+        if amount.is_integer():
+            amount = int(amount)
+        yield {'name': item['name'], 'units': units, 'amount': amount}
+
+
+def render_txt(items):
+    yield 'Список покупок: \n\n'
+    for item in items:
+        yield f'{item["name"]}: {item["amount"]}, {item["units"]}.\n'
+
+
+def render_csv(items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for item in items:
+        yield writer.writerow((item['name'], item['units'], item['amount']))
+
+
+def render_json(items):
+    yield '['
+    for index, item in enumerate(items):
+        yield (',' if index else '') + json.dumps(
+            {
+                'name': item['name'],
+                'measurement_unit': item['units'],
+                'amount': item['amount'],
+            },
+            ensure_ascii=False)
+    yield ']'
+
+
+# формат: (генератор, content type, расширение файла)
+SHOPPING_CART_FORMATS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8', 'txt'),
+    'csv': (render_csv, 'text/csv; charset=utf-8', 'csv'),
+    'json': (render_json, 'application/json; charset=utf-8', 'json'),
+}
+DEFAULT_SHOPPING_CART_FORMAT = 'txt'
@@ -0,0 +1,94 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from django.shortcuts import redirect
+from django.views.decorators.http import require_safe
+
+from api.constants import (
+    SHORT_LINK_ALPHABET,
+    SHORT_LINK_LENGTH,
+    SHORT_LINK_MULTIPLIER
+)
+from recipes.models import Recipe
+
+BASE = len(SHORT_LINK_ALPHABET)
+MODULUS = BASE ** SHORT_LINK_LENGTH
+INVERSE = pow(SHORT_LINK_MULTIPLIER, -1, MODULUS)
+DIGITS = {char: index for index, char in enumerate(SHORT_LINK_ALPHABET)}
+CODE_KEY = 'short_link:{code}'
+
+
+def encode(pk):
+    """Код фиксированной длины, по которому не видно порядок id."""
+    value = pk * SHORT_LINK_MULTIPLIER % MODULUS
+    chars = []
+    for _ in range(SHORT_LINK_LENGTH):
+        value, digit = divmod(value, BASE)
+        chars.append(SHORT_LINK_ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def decode(code):
+    """id рецепта по коду или None для неверного кода.
+
+    Ссылки старого вида /s/<id>/ работают только для рецептов, созданных
+    до появления кодов (id не больше SHORT_LINK_LEGACY_MAX_ID), иначе по
+    ним можно перебрать все рецепты. Код проверяется первым, поэтому
+    семизначные цифровые коды не принимаются за id.
+    """
+    if len(code) == SHORT_LINK_LENGTH:
+        value = 0
+        for char in code:
+            if char not in DIGITS:
+                return None
+            value = value * BASE + DIGITS[char]
+        return value * INVERSE % MODULUS
+    # у ссылки на id одна запись: без ведущих нулей
+    if (code.isdigit() and not code.startswith('0')
+            and int(code) <= settings.SHORT_LINK_LEGACY_MAX_ID):
+        return int(code)
+    return None
+
+
+def resolve(code):
+    """id существующего рецепта.
+
+    Найденные коды запоминаются в общем кэше: удаление рецепта
+    стирает их там же, и ссылка перестаёт работать во всех процессах.
+    """
+    key = CODE_KEY.format(code=code)
+    pk = cache.get(key)
+    if pk is not None:
+        return pk
+    pk = decode(code)
+    if pk is None or not Recipe.objects.filter(pk=pk).exists():
+        return None
+    cache.set(key, pk, timeout=settings.SHORT_LINK_CACHE_TIMEOUT)
+    return pk
+
+
+def forget(pk):
+    cache.delete_many([
+        CODE_KEY.format(code=encode(pk)),
+        CODE_KEY.format(code=pk)])
+
+
+def recipe_redirect(code, pk):
+    if pk is None:
+        raise Http404(f'Рецепт по ссылке "{code}" не найден.')
+    return redirect(f'/recipes/{pk}/')
+
+
+@require_safe
+def short_link_redirect(request, code):
+    return recipe_redirect(code, resolve(code))
+
+
+async def async_short_link_redirect(request, code):
+    """Переход по ссылке в режиме ASGI.
+
+    Общий кэш и база блокируют, поэтому код разбирается в потоке.
+    """
+    pk = await sync_to_async(resolve, thread_sensitive=False)(code)
+    return recipe_redirect(code, pk)
@@ -0,0 +1,34 @@
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.cache import bump_version
+from api.connections import check_connections, set_statement_timeout
+from api.short_links import forget
+from recipes.models import Ingredient, Recipe, Tag
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tags(**kwargs):
+    bump_version('tags')
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    bump_version('ingredients')
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_short_link(sender, instance, **kwargs):
+    forget(instance.pk)
+
+
+@receiver(request_started)
+def check_db_connections(**kwargs):
+    check_connections()
+
+
+@receiver(connection_created)
+def configure_db_connection(sender, connection, **kwargs):
+    set_statement_timeout(connection)
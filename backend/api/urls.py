@@ -2,25 +2,42 @@ from django.urls import include, path
 from django.views.generic import TemplateView
 from rest_framework import routers
 
-
+from api.async_views import async_routes
 from api.views import (
     IngredientViewSet,
+    MetricsView,
     RecipeViewSet,
+    ShoppingListViewSet,
     TagViewSet,
     UserViewSet)
 
 app_name = 'api'
 
+# маршруты только для чтения, в режиме ASGI выполняются в пуле потоков
+ASYNC_ROUTES = {
+    'recipes-list',
+    'recipes-detail',
+    'recipes-download-shopping-cart',
+    'tags-list',
+    'tags-detail',
+    'ingredients-list',
+    'ingredients-detail',
+    'ingredients-autocomplete',
+}
+
 router = routers.DefaultRouter()
 router.register('users', UserViewSet, basename='users')
 router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
+router.register(
+    'shopping-list', ShoppingListViewSet, basename='shopping-list')
 
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(async_routes(router.urls, ASYNC_ROUTES))),
     path('', include('djoser.urls')),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('docs/', TemplateView.as_view(template_name='docs/redoc.html'),
          name='redoc'),
     path('auth/', include('djoser.urls.authtoken')),
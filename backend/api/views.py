@@ -1,22 +1,32 @@
-from django.core.exceptions import ValidationError
-from django.db.models import F, Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404, redirect
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from django.views.decorators.http import require_GET
 from djoser.views import UserViewSet as UViewSet
-from rest_framework import status, viewsets
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import MethodNotAllowed
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import (
     AllowAny,
+    IsAdminUser,
     IsAuthenticated,
     IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
+from rest_framework.views import APIView
 
+from api.cache import CachedReferenceMixin
+from api.constants import (
+    AUTOCOMPLETE_LIMIT,
+    AUTOCOMPLETE_MAX_LIMIT,
+    SHOPPING_CART_CHUNK_SIZE)
 from api.filters import IngredientFilter, RecipesFilter
+from api.metrics import snapshot
+from api.pagination import (
+    CursorPaginationMixin,
+    RecipeCursorPagination,
+    SubscriptionCursorPagination)
 from api.permissions import IsAuthorOrReadOnly
 from api.serializers import (
     AvatarSerializer,
@@ -24,34 +34,44 @@ from api.serializers import (
     FavoriteSerializer,
     PasswordSerializer,
     RecipeEditSerializer,
+    RecipeIdsSerializer,
     RecipeReadSerializer,
     ShoppingCartSerializer,
+    ShoppingListItemSerializer,
     SubscriptionSerializer,
     SubscriptionUserSerializer,
     TagSerializer,
     UserSerializer)
+from api.short_links import encode
+from api.shopping_cart import (
+    DEFAULT_SHOPPING_CART_FORMAT,
+    SHOPPING_CART_FORMATS,
+    IgnoreFormatContentNegotiation,
+    display_items)
 from recipes.models import (
     Ingredient,
-    IngredientInRecipe,
     Favorite,
     Recipe,
     ShoppingCart,
+    ShoppingListItem,
     Tag)
 from users.models import Subscription, User
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CachedReferenceMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для тегов."""
 
+    cache_name = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CachedReferenceMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для просмотра ингредиентов."""
 
+    cache_name = 'ingredients'
     queryset = Ingredient.objects.all()
     model = Ingredient
     serializer_class = IngredientSerializer
@@ -60,19 +80,49 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [IngredientFilter]
     search_fields = ['^name']
 
+    @action(
+        detail=False,
+        methods=['GET'],
+        filter_backends=[])
+    def autocomplete(self, request):
+        return self.cached_response(request, self.autocomplete_response)
+
+    def autocomplete_response(self, request):
+        name = request.query_params.get('name', '').strip()
+        try:
+            limit = min(
+                int(request.query_params.get('limit', AUTOCOMPLETE_LIMIT)),
+                AUTOCOMPLETE_MAX_LIMIT)
+        except ValueError:
+            return Response(
+                {'limit': ['Ожидается целое число.']},
+                status=status.HTTP_400_BAD_REQUEST)
+        if not name or limit < 1:
+            return Response([])
+        serializer = self.get_serializer(
+            Ingredient.objects.autocomplete(name)[:limit], many=True)
+        return Response(serializer.data)
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CursorPaginationMixin, viewsets.ModelViewSet):
     """Вьюсет для работы с рецептами."""
 
     queryset = Recipe.objects.all()
     serializer_class = RecipeReadSerializer
     permission_classes = (IsAuthorOrReadOnly,)
     pagination_class = PageNumberPagination
+    cursor_pagination_class = RecipeCursorPagination
     filterset_class = RecipesFilter
     filter_backends = (DjangoFilterBackend,)
 
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve', 'feed'):
+            return Recipe.objects.with_related().with_user_flags(
+                self.request.user)
+        return Recipe.objects.all()
+
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve', 'get-link'):
+        if self.action in ('list', 'retrieve', 'get-link', 'feed'):
             return RecipeReadSerializer
         return RecipeEditSerializer
 
@@ -85,7 +135,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def get_link(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
-        rev_link = reverse('get_short_link', args=[recipe.pk])
+        rev_link = reverse('get_short_link', args=[encode(recipe.pk)])
         return Response({'short-link': request.build_absolute_uri(rev_link)},
                         status=status.HTTP_200_OK,)
 
@@ -128,46 +178,116 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ShoppingCart,
             ShoppingCartSerializer)
 
+    def bulk_recipe_action(self, request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        found = set(Recipe.objects.filter(pk__in=recipe_ids).values_list(
+            'pk', flat=True))
+        statuses = dict.fromkeys(recipe_ids, 'not_found')
+        if request.method == 'POST':
+            created, existing = model.objects.add_recipes(
+                request.user, [pk for pk in recipe_ids if pk in found])
+            statuses.update(dict.fromkeys(existing, 'exists'))
+            statuses.update(dict.fromkeys(created, 'created'))
+        else:
+            statuses.update(dict.fromkeys(found, 'not_in_list'))
+            statuses.update(dict.fromkeys(model.objects.remove_recipes(
+                request.user, list(found)), 'deleted'))
+        return Response({'recipes': [
+            {'id': pk, 'status': recipe_status}
+            for pk, recipe_status in statuses.items()]})
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        permission_classes=[IsAuthenticated],
+        url_path='favorite',
+        url_name='bulk-favorite')
+    def bulk_favorite(self, request):
+        return self.bulk_recipe_action(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        permission_classes=[IsAuthenticated],
+        url_path='shopping_cart',
+        url_name='bulk-shopping-cart')
+    def bulk_shopping_cart(self, request):
+        return self.bulk_recipe_action(request, ShoppingCart)
+
     @action(
         detail=False,
         methods=['GET'],
-        permission_classes=[IsAuthenticated])
+        permission_classes=[IsAuthenticated],
+        pagination_class=RecipeCursorPagination)
+    def feed(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            author__in=Subscription.objects.filter(
+                user=request.user).values('author'))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[IsAuthenticated],
+        content_negotiation_class=IgnoreFormatContentNegotiation)
     def download_shopping_cart(self, request):
-        recipes = Recipe.objects.filter(shopping_cart__user=request.user)
-        shopping_cart = IngredientInRecipe.objects.filter(
-            recipe__in=recipes).values(
-            name=F('ingredient__name'),
-            units=F('ingredient__measurement_unit')).order_by(
-            'ingredient__name').annotate(total=Sum('amount'))
-        text = 'Список покупок: \n\n'
-        ingr_list = []
-        for recipe in shopping_cart:
-            ingr_list.append(recipe)
-        for i in ingr_list:
-            text += f'{i["name"]}: {i["total"]}, {i["units"]}.\n'
-        response = HttpResponse(text, content_type='text/plain')
+        export_format = request.query_params.get(
+            'format', DEFAULT_SHOPPING_CART_FORMAT)
+        if export_format not in SHOPPING_CART_FORMATS:
+            return Response(
+                {'format': [
+                    f'Допустимые форматы: '
+                    f'{", ".join(SHOPPING_CART_FORMATS)}.']},
+                status=status.HTTP_400_BAD_REQUEST)
+        render, content_type, extension = SHOPPING_CART_FORMATS[
+            export_format]
+        shopping_cart = ShoppingListItem.objects.filter(
+            user=request.user).normalized().iterator(
+            chunk_size=SHOPPING_CART_CHUNK_SIZE)
+        response = StreamingHttpResponse(
+            render(display_items(shopping_cart)), content_type=content_type)
         response['Content-Disposition'] = (
             'attachment;'
-            'filename="shopping_cart.txt"')
+            f'filename="shopping_cart.{extension}"')
         return response
 
 
-@require_GET
-def get_short_link(request, pk):
-    try:
-        Recipe.objects.filter(pk=pk).exists()
-        return redirect(f'/recipes/{pk}/')
-    except Exception:
-        raise ValidationError(f'Рецепт с id "{pk}" не найден.')
+class ShoppingListViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Вьюсет для суммарного списка покупок пользователя."""
+
+    serializer_class = ShoppingListItemSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = None
+
+    def get_queryset(self):
+        return ShoppingListItem.objects.filter(
+            user=self.request.user).select_related('ingredient').order_by(
+            'ingredient__name')
+
+
+class MetricsView(APIView):
+    """Гистограммы времени ответа и числа SQL-запросов процесса."""
+
+    permission_classes = (IsAdminUser,)
 
+    def get(self, request):
+        return Response(snapshot())
 
-class UserViewSet(UViewSet):
+
+class UserViewSet(CursorPaginationMixin, UViewSet):
     """Вьюсет для работы с пользователями и подписками."""
 
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
 
+    def get_queryset(self):
+        return super().get_queryset().with_is_subscribed(self.request.user)
+
     @action(
         detail=False,
         methods=['GET'],
@@ -240,11 +360,24 @@ class UserViewSet(UViewSet):
     @action(
         detail=False,
         methods=('GET',),
-        permission_classes=[IsAuthenticated])
+        permission_classes=[IsAuthenticated],
+        cursor_pagination_class=SubscriptionCursorPagination)
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(following_author__user=user)
+        limit = request.query_params.get('recipes_limit')
+        if limit is not None and not limit.isdigit():
+            return Response(
+                {'recipes_limit': ['Ожидается целое число.']},
+                status=status.HTTP_400_BAD_REQUEST)
+        queryset = User.objects.filter(
+            following_author__user=user).with_is_subscribed(user)
         pages = self.paginate_queryset(queryset)
+        recipes = Recipe.objects.without_search_fields().filter(
+            author__in=pages)
+        if limit:
+            recipes = recipes.limit_per_author(int(limit))
+        prefetch_related_objects(pages, Prefetch(
+            'recipes', queryset=recipes, to_attr='limited_recipes'))
         serializer = SubscriptionUserSerializer(
             pages,
             many=True,
@@ -9,8 +9,12 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+
+from api.async_views import StreamingASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
-application = get_asgi_application()
+# то же, что get_asgi_application(), с потоковыми ответами вне цикла событий
+django.setup(set_prefix=False)
+application = StreamingASGIHandler()
@@ -35,6 +35,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.QueryInstrumentationMiddleware',
+    'api.middleware.short_link_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -48,7 +50,8 @@ ROOT_URLCONF = 'foodgram.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        # api/docs/redoc.html для /api/docs/ при запуске без nginx
+        'DIRS': [BASE_DIR / 'api'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -64,6 +67,9 @@ TEMPLATES = [
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
 
+# подключение через PgBouncer в режиме transaction
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', 'False').lower() in ('true', '1', 't')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -71,10 +77,20 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        # PgBouncer в режиме transaction не поддерживает серверные курсоры
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
     }
 }
 
+# проверка постоянного соединения перед запросом и statement_timeout в мс,
+# выставляемый каждому новому соединению (0 - без ограничения,
+# через PgBouncer не выставляется)
+DB_CONN_HEALTH_CHECKS = os.getenv(
+    'DB_CONN_HEALTH_CHECKS', 'True').lower() in ('true', '1', 't')
+DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 0))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -101,6 +117,36 @@ USE_L10N = True
 USE_TZ = True
 
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# кэш справочников (теги, ингредиенты)
+REFERENCE_CACHE_TIMEOUT = int(os.getenv('REFERENCE_CACHE_TIMEOUT', 60 * 60))
+REFERENCE_CACHE_LOCAL_SIZE = int(os.getenv('REFERENCE_CACHE_LOCAL_SIZE', 256))
+
+# метрики запросов: число SQL, время БД, заголовок Server-Timing
+REQUEST_METRICS = os.getenv(
+    'REQUEST_METRICS', 'False').lower() in ('true', '1', 't')
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+
+# режим сервера: wsgi или asgi, задаётся и для gunicorn.conf.py
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+# время жизни разобранных коротких ссылок в общем кэше
+SHORT_LINK_CACHE_TIMEOUT = int(
+    os.getenv('SHORT_LINK_CACHE_TIMEOUT', 24 * 60 * 60))
+# ссылки вида /s/<id>/ работают только для рецептов до этого id
+SHORT_LINK_LEGACY_MAX_ID = int(os.getenv('SHORT_LINK_LEGACY_MAX_ID', 0))
+
+# потоки фоновой обработки изображений рецептов
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+
 STATIC_URL = '/backend_static/'
 STATIC_ROOT = BASE_DIR / 'collected_static/'
 
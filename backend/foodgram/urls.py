@@ -3,12 +3,12 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
-from api.views import get_short_link
+from api.short_links import short_link_redirect
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls', namespace='api')),
-    path('s/<int:pk>/', get_short_link, name='get_short_link'),
+    path('s/<str:code>/', short_link_redirect, name='get_short_link'),
 ]
 
 if settings.DEBUG:
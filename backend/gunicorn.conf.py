@@ -0,0 +1,41 @@
+"""Настройки gunicorn, режим и число воркеров задаются окружением.
+
+SERVER_MODE=wsgi - синхронные воркеры и foodgram.wsgi,
+SERVER_MODE=asgi - воркеры uvicorn и foodgram.asgi.
+"""
+import math
+import os
+
+
+def available_cpus():
+    """Число процессоров с учётом лимита контейнера.
+
+    os.cpu_count() в контейнере возвращает процессоры всего хоста,
+    поэтому сначала читается квота cgroup v2, затем cgroup v1.
+    """
+    cpus = len(os.sched_getaffinity(0))
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as cpu_max:
+            quota, period = cpu_max.read().split()
+    except (OSError, ValueError):
+        try:
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as cpu_quota, \
+                    open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as cpu_period:
+                quota, period = cpu_quota.read(), cpu_period.read()
+        except OSError:
+            return cpus
+    if quota.strip() in ('max', '-1'):
+        return cpus
+    return max(1, min(cpus, math.ceil(int(quota) / int(period))))
+
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:9090')
+# каждый воркер держит постоянное соединение с базой,
+# поэтому по умолчанию воркер на процессор и ещё один
+workers = int(os.getenv('GUNICORN_WORKERS', available_cpus() + 1))
+
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'foodgram.asgi:application'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
@@ -1,3 +1,5 @@
+from collections import Counter
+
 from django.contrib import admin
 from recipes.models import (
     Ingredient,
@@ -5,10 +7,16 @@ from recipes.models import (
     Favorite,
     Recipe,
     ShoppingCart,
+    ShoppingListItem,
     Tag
 )
 
 
+def recipe_amounts(recipe):
+    return Counter(dict(recipe.ingredient_in_recipes.values_list(
+        'ingredient_id', 'amount')))
+
+
 class IngredientInRecipeInline(admin.TabularInline):
     model = IngredientInRecipe
 
@@ -37,6 +45,14 @@ class IngredientAdmin(admin.ModelAdmin):
     list_display_links = ('name',)
     search_fields = ('name',)
 
+    def save_related(self, request, form, formsets, change):
+        # переименование пересчитывает рецепты в сигнале ingredient_saved,
+        # здесь - только рецепты, где ингредиент добавлен или удалён
+        before = set(form.instance.recipes.values_list('pk', flat=True))
+        super().save_related(request, form, formsets, change)
+        after = set(form.instance.recipes.values_list('pk', flat=True))
+        Recipe.objects.filter(pk__in=before ^ after).update_search_fields()
+
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
@@ -54,7 +70,20 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @admin.display(description='Добавлено в избранное')
     def in_favorite(self, obj):
-        return f'{obj.favorites.count()} польз.'
+        return f'{obj.favorites_count} польз.'
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not IngredientInRecipe or not change:
+            return super().save_formset(request, form, formset, change)
+        before = recipe_amounts(form.instance)
+        super().save_formset(request, form, formset, change)
+        after = recipe_amounts(form.instance)
+        after.subtract(before)
+        ShoppingListItem.objects.change_recipe(form.instance.pk, after)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Recipe.objects.filter(pk=form.instance.pk).update_search_fields()
 
 
 @admin.register(ShoppingCart)
@@ -0,0 +1,163 @@
+import base64
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.utils.deconstruct import deconstructible
+from PIL import Image, features
+
+from api.constants import (
+    BASE64_CHUNK_SIZE,
+    IMAGE_FORMATS,
+    IMAGE_MAX_BYTES,
+    IMAGE_MAX_SIDE,
+    IMAGE_SPOOL_SIZE,
+    IMAGE_VARIANTS
+)
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, называющее файлы по хэшу содержимого.
+
+    Одинаковые загрузки сохраняются на диск один раз.
+    """
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = os.path.split(name)
+        name = os.path.join(
+            directory,
+            digest.hexdigest()[:32] + os.path.splitext(filename)[1].lower())
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+    def save_variant(self, name, content):
+        """Сохраняет производный файл под заданным именем."""
+        return super().save(name, content)
+
+
+def decode_base64_image(data):
+    """Декодирует data:image;base64 по частям во временный файл.
+
+    Размер проверяется по мере декодирования, размеры изображения -
+    по заголовку до чтения пикселей. Расширение файла берётся из
+    формата, который определил Pillow, а не из заголовка data:.
+    """
+    _, _, encoded = data.partition(';base64,')
+    if len(encoded) * 3 // 4 > IMAGE_MAX_BYTES:
+        raise ValueError(
+            f'Размер изображения больше {IMAGE_MAX_BYTES // 1024} КиБ.')
+    buffer = SpooledTemporaryFile(max_size=IMAGE_SPOOL_SIZE)
+    try:
+        for start in range(0, len(encoded), BASE64_CHUNK_SIZE):
+            buffer.write(base64.b64decode(
+                encoded[start:start + BASE64_CHUNK_SIZE], validate=True))
+        buffer.seek(0)
+        with Image.open(buffer) as image:
+            width, height = image.size
+            image_format = image.format
+            image.verify()
+    except (ValueError, OSError, SyntaxError):
+        buffer.close()
+        raise ValueError('Загрузите корректное изображение.')
+    if image_format not in IMAGE_FORMATS:
+        buffer.close()
+        raise ValueError(
+            f'Поддерживаются форматы {", ".join(IMAGE_FORMATS)}.')
+    if max(width, height) > IMAGE_MAX_SIDE:
+        buffer.close()
+        raise ValueError(
+            f'Сторона изображения больше {IMAGE_MAX_SIDE} пикселей.')
+    buffer.seek(0)
+    return File(buffer, name=f'image.{IMAGE_FORMATS[image_format]}')
+
+
+def variant_name(name, variant):
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants', f'{stem}_{variant}.webp')
+
+
+def generate_variants(storage, name):
+    """Создаёт уменьшенные WebP-копии изображения, если их ещё нет.
+
+    Возвращает True, если все варианты есть в хранилище.
+    """
+    if not features.check('webp'):
+        logger.warning('Pillow собран без WebP, варианты не создаются.')
+        return False
+    try:
+        with storage.open(name) as file, Image.open(file) as image:
+            image.load()
+            for variant, max_size in IMAGE_VARIANTS.items():
+                target = variant_name(name, variant)
+                if storage.exists(target):
+                    continue
+                copy = image.copy()
+                if max_size:
+                    copy.thumbnail((max_size, max_size))
+                with SpooledTemporaryFile(
+                        max_size=IMAGE_SPOOL_SIZE) as output:
+                    copy.save(output, format='WEBP')
+                    output.seek(0)
+                    storage.save_variant(target, File(output))
+    except Exception:
+        logger.exception('Не удалось создать варианты изображения %s', name)
+        return False
+    return True
+
+
+def mark_variants_ready(name):
+    """Отмечает рецепты с изображением name: ссылки ведут на варианты."""
+    apps.get_model('recipes', 'Recipe').objects.filter(image=name).update(
+        has_image_variants=True)
+
+
+def build_variants(storage, name):
+    try:
+        if generate_variants(storage, name):
+            mark_variants_ready(name)
+    finally:
+        # поток пула живёт долго, соединение ему между задачами не нужно
+        connection.close()
+
+
+def schedule_variants(image):
+    """Ставит создание вариантов изображения в фоновый пул потоков."""
+    global _executor
+    if not image:
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS,
+            thread_name_prefix='image-variants')
+    _executor.submit(build_variants, image.storage, image.name)
+
+
+def variant_urls(image, ready):
+    """Ссылки на варианты изображения или на оригинал, пока их нет.
+
+    Готовность вариантов хранится в рецепте, хранилище не опрашивается.
+    """
+    return {
+        variant: (
+            image.storage.url(variant_name(image.name, variant)) if ready
+            else image.url)
+        for variant in IMAGE_VARIANTS}
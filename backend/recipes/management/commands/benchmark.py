@@ -0,0 +1,345 @@
+import random
+import time
+import tracemalloc
+from itertools import cycle, islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Count, F, Q
+from django.test import Client
+from rest_framework.test import APIClient
+
+from api.constants import AUTOCOMPLETE_LIMIT
+from api.short_links import encode, forget
+from recipes.models import (
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag
+)
+from recipes.synthetic import tiny_png_base64
+from users.models import User
+
+INGREDIENTS_PER_RECIPE = 10
+BATCH_SIZE = 10000
+AUTOCOMPLETE_QUERIES = ('со', 'мук', 'томат', 'ябл')
+SEARCH_WORDS = (
+    'курица', 'говядина', 'томаты', 'сыр', 'картофель', 'лук', 'чеснок',
+    'морковь', 'рис', 'гречка', 'суп', 'салат', 'пирог', 'запечь',
+    'обжарить', 'варить', 'тушить', 'нарезать', 'смешать', 'духовка',
+    'сковорода', 'соус', 'сливки', 'грибы', 'яблоки', 'тесто', 'перец',
+    'зелень', 'масло', 'мука')
+# последний запрос - редкое слово, номер из названия рецепта
+SEARCH_QUERIES = (
+    'салат', 'курица с грибами', 'пирог -яблоки', '"обжарить лук"', '777')
+SEARCH_TEXT_WORDS = 10
+# режим подбора, число ингредиентов у пользователя, допустимо недостающих
+INGREDIENT_MATCH_QUERIES = (
+    ('all', 2, 0), ('any', 10, 0), ('only', 20, 0), ('only', 20, 1))
+# соединение на запрос: новое, постоянное, постоянное с проверкой
+CONNECTION_MODES = (
+    ('новое', False, False),
+    ('постоянное', True, False),
+    ('постоянное + проверка', True, True))
+
+
+class QueryCounter:
+    """Считает запросы к базе через connection.execute_wrapper."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = ('Замеры производительности на временных данных. '
+            'Все созданные записи откатываются после замера.')
+
+    scenarios = (
+        'shopping_cart',
+        'ingredient_autocomplete',
+        'recipe_create',
+        'short_link',
+        'recipe_search',
+        'ingredient_match',
+        'db_connection',
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=self.scenarios)
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[10, 100, 1000],
+            help='Размеры данных, на которых выполняется замер.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            getattr(self, f'bench_{options["scenario"]}')(options['sizes'])
+            transaction.set_rollback(True)
+
+    def create_user(self, prefix):
+        return User.objects.create(
+            email=f'{prefix}@benchmark.local',
+            username=prefix,
+            first_name=prefix,
+            last_name=prefix)
+
+    def create_recipes(self, author, count, offset=0):
+        names = [
+            f'benchmark-{author.pk}-{index}'
+            for index in range(offset, offset + count)]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г') for name in names)
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=name,
+                text='benchmark',
+                cooking_time=1,
+                image='recipes/benchmark.png')
+            for name in names)
+        ingredients = list(Ingredient.objects.filter(name__in=names))
+        recipes = list(Recipe.objects.filter(name__in=names))
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe,
+                ingredient=ingredients[(index + shift) % len(ingredients)],
+                amount=shift + 1)
+            for index, recipe in enumerate(recipes)
+            for shift in range(min(INGREDIENTS_PER_RECIPE, count)))
+        return recipes
+
+    def bench_shopping_cart(self, sizes):
+        user = self.create_user('benchmark-cart')
+        client = APIClient()
+        client.force_authenticate(user)
+        self.stdout.write('рецептов  строк  пик памяти, КиБ  время, мс')
+        created = 0
+        for size in sorted(sizes):
+            recipes = self.create_recipes(user, size - created, created)
+            # через менеджер, а не bulk_create: список покупок
+            # обновляется вместе с корзиной
+            ShoppingCart.objects.add_recipes(
+                user, [recipe.pk for recipe in recipes])
+            created = size
+            # заголовок из двух строк и строка на каждый ингредиент
+            expected = 2 + IngredientInRecipe.objects.filter(
+                recipe__shopping_cart__user=user).values(
+                'ingredient').distinct().count()
+            tracemalloc.start()
+            start = time.perf_counter()
+            response = client.get('/api/recipes/download_shopping_cart/')
+            lines = sum(
+                chunk.count(b'\n') for chunk in response.streaming_content)
+            elapsed = (time.perf_counter() - start) * 1000
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if lines != expected:
+                raise CommandError(
+                    f'В списке покупок {lines} строк вместо {expected}')
+            self.stdout.write(
+                f'{size:>8}  {lines:>5}  {peak / 1024:>15.1f}  '
+                f'{elapsed:>9.1f}')
+
+    def fill_ingredients(self, count, offset):
+        words = list(Ingredient.objects.values_list(
+            'name', flat=True)[:500]) or ['ингредиент']
+        names = islice(cycle(words), offset, offset + count)
+        for start in range(offset, offset + count, BATCH_SIZE):
+            Ingredient.objects.bulk_create(
+                Ingredient(
+                    name=f'{name} {index}',
+                    measurement_unit='г')
+                for index, name in zip(
+                    range(start, min(start + BATCH_SIZE, offset + count)),
+                    names))
+
+    def bench_ingredient_autocomplete(self, sizes):
+        self.stdout.write('ингредиентов  запрос  найдено  время, мс')
+        created = 0
+        for size in sorted(sizes):
+            self.fill_ingredients(size - created, created)
+            created = size
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'ANALYZE {Ingredient._meta.db_table}')
+            for query in AUTOCOMPLETE_QUERIES:
+                start = time.perf_counter()
+                found = len(Ingredient.objects.autocomplete(query)[
+                    :AUTOCOMPLETE_LIMIT])
+                elapsed = (time.perf_counter() - start) * 1000
+                self.stdout.write(
+                    f'{size:>12}  {query:>6}  {found:>7}  {elapsed:>9.1f}')
+
+    def bench_recipe_create(self, sizes):
+        user = self.create_user('benchmark-create')
+        tag = Tag.objects.create(
+            name='benchmark-create', slug='benchmark-create')
+        self.fill_ingredients(max(sizes), 0)
+        ingredients = list(Ingredient.objects.values_list(
+            'pk', flat=True)[:max(sizes)])
+        image = tiny_png_base64()
+        client = APIClient()
+        client.force_authenticate(user)
+        self.stdout.write('ингредиентов  запросов  время, мс')
+        for size in sorted(sizes):
+            counter = QueryCounter()
+            start = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                client.post('/api/recipes/', {
+                    'name': f'benchmark-create-{size}',
+                    'text': 'benchmark',
+                    'cooking_time': 1,
+                    'image': image,
+                    'tags': [tag.pk],
+                    'ingredients': [
+                        {'id': ingredient, 'amount': 1}
+                        for ingredient in ingredients[:size]]},
+                    format='json')
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stdout.write(
+                f'{size:>12}  {counter.count:>8}  {elapsed:>9.1f}')
+
+    def bench_short_link(self, sizes):
+        user = self.create_user('benchmark-link')
+        client = Client()
+        self.stdout.write('рецептов  проход     запросов/с  запросов к БД')
+        created = 0
+        for size in sorted(sizes):
+            self.create_recipes(user, size - created, created)
+            created = size
+            pks = list(Recipe.objects.filter(author=user).values_list(
+                'pk', flat=True))
+            for pk in pks:
+                forget(pk)
+            paths = [f'/s/{encode(pk)}/' for pk in pks]
+            for title in ('холодный', 'из кэша'):
+                counter = QueryCounter()
+                start = time.perf_counter()
+                with connection.execute_wrapper(counter):
+                    for path in paths:
+                        client.get(path)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'{size:>8}  {title:<9}  {len(paths) / elapsed:>10.0f}  '
+                    f'{counter.count:>13}')
+
+    def fill_search_recipes(self, author, count, offset, rng):
+        ingredients = list(Ingredient.objects.values_list('pk', flat=True))
+        for start in range(offset, offset + count, BATCH_SIZE):
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    author=author,
+                    name=' '.join((*rng.sample(SEARCH_WORDS, 2), str(index))),
+                    text=' '.join(rng.choices(
+                        SEARCH_WORDS, k=SEARCH_TEXT_WORDS)),
+                    cooking_time=1,
+                    image='recipes/benchmark.png')
+                for index in range(
+                    start, min(start + BATCH_SIZE, offset + count)))
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(recipe=recipe, ingredient_id=ingredient,
+                                   amount=1)
+                for recipe in recipes
+                for ingredient in rng.sample(ingredients, 3))
+        Recipe.objects.filter(
+            author=author, search_vector__isnull=True).update_search_fields()
+
+    def bench_recipe_search(self, sizes):
+        user = self.create_user('benchmark-search')
+        self.fill_ingredients(500, 0)
+        rng = random.Random(0)
+        client = APIClient()
+        self.stdout.write(
+            'рецептов  запрос               найдено  поиск, мс  '
+            'icontains, мс')
+        created = 0
+        for size in sorted(sizes):
+            self.fill_search_recipes(user, size - created, created, rng)
+            created = size
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Recipe._meta.db_table}')
+            for query in SEARCH_QUERIES:
+                start = time.perf_counter()
+                response = client.get('/api/recipes/', {'search': query})
+                elapsed = (time.perf_counter() - start) * 1000
+                word = query.strip('"').split()[0]
+                start = time.perf_counter()
+                Recipe.objects.filter(
+                    Q(name__icontains=word) | Q(text__icontains=word)
+                ).count()
+                naive = (time.perf_counter() - start) * 1000
+                self.stdout.write(
+                    f'{size:>8}  {query:<19}  {response.data["count"]:>7}  '
+                    f'{elapsed:>9.1f}  {naive:>13.1f}')
+
+    def bench_ingredient_match(self, sizes):
+        user = self.create_user('benchmark-match')
+        self.fill_ingredients(500, 0)
+        rng = random.Random(0)
+        pool = list(Ingredient.objects.values_list('pk', flat=True)[:500])
+        client = APIClient()
+        self.stdout.write(
+            'рецептов  режим  ингредиентов  найдено  индекс, мс  '
+            'HAVING COUNT, мс')
+        created = 0
+        for size in sorted(sizes):
+            self.fill_search_recipes(user, size - created, created, rng)
+            created = size
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Recipe._meta.db_table}')
+            for mode, count, missing in INGREDIENT_MATCH_QUERIES:
+                ids = rng.sample(pool, count)
+                start = time.perf_counter()
+                response = client.get('/api/recipes/', {
+                    'ingredients': ','.join(map(str, ids)),
+                    'ingredients_mode': mode,
+                    'missing': missing})
+                elapsed = (time.perf_counter() - start) * 1000
+                start = time.perf_counter()
+                naive = Recipe.objects.annotate(
+                    total=Count('ingredient_in_recipes'),
+                    matched=Count('ingredient_in_recipes', filter=Q(
+                        ingredient_in_recipes__ingredient__in=ids)))
+                if mode == 'all':
+                    naive = naive.filter(matched=count)
+                elif mode == 'any':
+                    naive = naive.filter(matched__gt=0)
+                else:
+                    naive = naive.filter(
+                        matched__gt=0, total__lte=F('matched') + missing)
+                naive.count()
+                list(naive.order_by('-matched', '-pub_date')[:6])
+                naive_elapsed = (time.perf_counter() - start) * 1000
+                self.stdout.write(
+                    f'{size:>8}  {mode:<5}  {count:>12}  '
+                    f'{response.data["count"]:>7}  {elapsed:>10.1f}  '
+                    f'{naive_elapsed:>16.1f}')
+
+    def bench_db_connection(self, sizes):
+        self.stdout.write(
+            'запросов  соединение               мс на запрос  запросов/с')
+        for size in sorted(sizes):
+            for title, persistent, check in CONNECTION_MODES:
+                db = connections.create_connection(DEFAULT_DB_ALIAS)
+                start = time.perf_counter()
+                for _ in range(size):
+                    if check and db.connection is not None and (
+                            not db.is_usable()):
+                        db.close()
+                    with db.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+                    if not persistent:
+                        db.close()
+                elapsed = time.perf_counter() - start
+                db.close()
+                self.stdout.write(
+                    f'{size:>8}  {title:<23}  {elapsed * 1000 / size:>12.2f}  '
+                    f'{size / elapsed:>10.0f}')
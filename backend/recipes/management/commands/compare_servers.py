@@ -0,0 +1,116 @@
+import io
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+MODES = ('wsgi', 'asgi')
+
+
+def tree_rss(pid):
+    """Память процесса и всех его потомков в мегабайтах по /proc."""
+    children = {}
+    for entry in Path('/proc').iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / 'stat').read_text()
+        except OSError:
+            continue
+        parent = int(stat.rsplit(')', 1)[1].split()[1])
+        children.setdefault(parent, []).append(int(entry.name))
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, ()))
+        try:
+            status = Path(f'/proc/{current}/status').read_text()
+        except OSError:
+            continue
+        for line in status.splitlines():
+            if line.startswith('VmRSS:'):
+                total += int(line.split()[1])
+    return total / 1024
+
+
+class Command(BaseCommand):
+    help = ('Запускает gunicorn по очереди в режимах WSGI и ASGI с одним '
+            'числом воркеров, нагружает каждый через load_test и выводит '
+            'задержки, пропускную способность и память. Данные должны быть '
+            'сохранены в базе, например, командой generate_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Количество воркеров gunicorn в обоих режимах.')
+        parser.add_argument('--port', type=int, default=9191)
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30,
+            help='Длительность нагрузки на каждый режим в секундах.')
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=20,
+            help='Количество одновременных клиентов.')
+        parser.add_argument(
+            '--prefix',
+            default='synthetic',
+            help='Префикс пользователей из generate_data.')
+
+    def handle(self, *args, **options):
+        url = f'http://127.0.0.1:{options["port"]}'
+        memory = {}
+        for mode in MODES:
+            server = self.start(mode, options)
+            try:
+                self.wait_ready(url, server)
+                before = tree_rss(server.pid)
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'{mode.upper()}, воркеров: {options["workers"]}'))
+                output = io.StringIO()
+                call_command(
+                    'load_test', url=url, duration=options['duration'],
+                    concurrency=options['concurrency'],
+                    prefix=options['prefix'], stdout=output)
+                self.stdout.write(output.getvalue())
+                memory[mode] = (before, tree_rss(server.pid))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+        for mode, (before, after) in memory.items():
+            self.stdout.write(
+                f'{mode}: память {before:.0f} МБ после запуска, '
+                f'{after:.0f} МБ после нагрузки')
+
+    def start(self, mode, options):
+        env = dict(
+            os.environ,
+            SERVER_MODE=mode,
+            GUNICORN_WORKERS=str(options['workers']),
+            GUNICORN_BIND=f'127.0.0.1:{options["port"]}')
+        return subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py'],
+            cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def wait_ready(self, url, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('gunicorn завершился при запуске')
+            try:
+                urllib.request.urlopen(f'{url}/api/tags/', timeout=1).read()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'Сервер не ответил за {timeout} с')
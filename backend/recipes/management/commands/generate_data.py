@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes import synthetic
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Создаёт синтетический набор данных для нагрузочного '
+            'тестирования: пользователей, рецепты, избранное, корзины и '
+            'подписки с Zipf-распределением популярности.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=8)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--favorites-per-user', type=int, default=30)
+        parser.add_argument('--carts-per-user', type=int, default=5)
+        parser.add_argument('--subscriptions-per-user', type=int, default=10)
+        parser.add_argument(
+            '--exponent',
+            type=float,
+            default=1.1,
+            help='Показатель Zipf: чем больше, тем сильнее перекос.')
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Зерно генератора, одинаковое зерно даёт одинаковые данные.')
+        parser.add_argument(
+            '--prefix',
+            default='synthetic',
+            help='Префикс имён, позволяет создать несколько наборов.')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(
+                f'Данные с префиксом "{prefix}" уже есть, '
+                f'укажите другой --prefix.')
+        start = time.perf_counter()
+        with transaction.atomic():
+            data = synthetic.generate(
+                users=options['users'],
+                recipes=options['recipes'],
+                tags=options['tags'],
+                ingredients=options['ingredients'],
+                favorites_per_user=options['favorites_per_user'],
+                carts_per_user=options['carts_per_user'],
+                subscriptions_per_user=options['subscriptions_per_user'],
+                exponent=options['exponent'],
+                seed=options['seed'],
+                prefix=prefix)
+        for name, rows in data.items():
+            self.stdout.write(f'{name}: {len(rows)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные созданы за {time.perf_counter() - start:.1f} с. '
+            f'Пароль пользователей: {synthetic.PASSWORD}'))
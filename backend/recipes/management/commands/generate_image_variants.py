@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_variants, mark_variants_ready
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Создаёт недостающие уменьшенные WebP-копии изображений '
+            'рецептов и отмечает рецепты, у которых они готовы, например, '
+            'рецепты, загруженные до их появления.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        storage = Recipe._meta.get_field('image').storage
+        processed = 0
+        names = Recipe.objects.filter(has_image_variants=False).exclude(
+            image='').order_by().values_list('image', flat=True).distinct()
+        for name in names.iterator():
+            if generate_variants(storage, name):
+                mark_variants_ready(name)
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed} '
+            f'за {time.perf_counter() - start:.2f} с'))
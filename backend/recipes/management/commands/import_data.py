@@ -1,7 +1,14 @@
 import csv
+import io
+import json
 import os
+import time
+from itertools import islice
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+
+from api.cache import bump_version
 from foodgram.settings import BASE_DIR
 from recipes.models import Ingredient, Tag
 
@@ -9,32 +16,191 @@ FILE_PATH = os.path.join(
     BASE_DIR,
     'data'
 )
+DEFAULT_BATCH_SIZE = 1000
+# размер куска, которым читается JSON-файл
+JSON_READ_SIZE = 64 * 1024
+
+# модель, имя файла без расширения, загружаемые поля
+IMPORTS = (
+    (Ingredient, 'ingredients', ('name', 'measurement_unit')),
+    (Tag, 'tags', ('name', 'slug')),
+)
+
+
+def iter_json_array(file, read_size=JSON_READ_SIZE):
+    """По одному отдаёт элементы JSON-массива верхнего уровня.
+
+    Файл читается кусками, в памяти держится только текущий элемент,
+    а не весь массив, как при json.load.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    # что ожидается дальше: '[', первый элемент или ']',
+    # элемент после запятой, ',' или ']' после элемента
+    expected = '['
+    while True:
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+        if position == len(buffer):
+            if eof:
+                raise ValueError('JSON-массив не закрыт')
+            buffer, position = file.read(read_size), 0
+            eof = not buffer
+            continue
+        char = buffer[position]
+        if expected == '[':
+            if char != '[':
+                raise ValueError('Ожидается JSON-массив объектов')
+            expected, position = 'first', position + 1
+        elif char == ']' and expected in ('first', 'separator'):
+            return
+        elif expected == 'separator':
+            if char != ',':
+                raise ValueError('Элементы JSON-массива не разделены')
+            expected, position = 'value', position + 1
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                end = None
+            # элемент на границе куска дочитывается, число могло обрезаться
+            if end is None or end == len(buffer) and not eof:
+                if eof:
+                    raise ValueError('Неверный JSON')
+                chunk = file.read(read_size)
+                eof = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            yield value
+            expected, position = 'separator', end
+
+
+def read_rows(path, fields):
+    """Построчно читает CSV, JSON или JSON Lines файл."""
+    extension = os.path.splitext(path)[1]
+    with open(path, encoding='utf-8') as file:
+        if extension == '.csv':
+            rows = csv.DictReader(file, delimiter=',')
+        elif extension == '.jsonl':
+            rows = (json.loads(line) for line in file if line.strip())
+        elif extension == '.json':
+            rows = iter_json_array(file)
+        else:
+            raise ValueError(f'Неподдерживаемый формат файла {path}')
+        for row in rows:
+            yield tuple(row[field] for field in fields)
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
 
 
 class Command(BaseCommand):
+    help = ('Загружает ингредиенты и теги из data/. Повторный запуск '
+            'пропускает уже существующие записи.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'json', 'jsonl'),
+            default='csv',
+            help='Формат файлов в data/, если путь не указан явно.')
+        parser.add_argument(
+            '--ingredients',
+            help='Путь к файлу ингредиентов.')
+        parser.add_argument(
+            '--tags',
+            help='Путь к файлу тегов.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в одной пачке вставки.')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Выполнить импорт и откатить транзакцию.')
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Загружать через COPY (только PostgreSQL).')
 
     def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy доступен только для PostgreSQL.')
         try:
-            with open(
-                os.path.join(FILE_PATH, 'ingredients.csv')
-            ) as file_csv:
-                data = csv.DictReader(file_csv, delimiter=',')
-                for row in data:
-                    Ingredient.objects.create(
-                        name=row['name'],
-                        measurement_unit=row['measurement_unit'],
-                    )
-                print('Файл ingredients.csv успешно импортирован')
-
-            with open(
-                os.path.join(FILE_PATH, 'tags.csv')
-            ) as file_csv:
-                data = csv.DictReader(file_csv, delimiter=',')
-                for row in data:
-                    Tag.objects.create(
-                        name=row['name'],
-                        slug=row['slug'],
-                    )
-                print('Файл tags.csv успешно импортирован')
-        except Exception as error:
+            with transaction.atomic():
+                for model, name, fields in IMPORTS:
+                    path = options[name] or os.path.join(
+                        FILE_PATH, f'{name}.{options["format"]}')
+                    self.import_file(
+                        model, path, fields,
+                        options['batch_size'], options['copy'])
+                if options['dry_run']:
+                    transaction.set_rollback(True)
+                    self.stdout.write('Пробный запуск: изменения отменены')
+                else:
+                    for _, name, _ in IMPORTS:
+                        transaction.on_commit(
+                            lambda name=name: bump_version(name))
+        except (OSError, KeyError, ValueError, DatabaseError) as error:
             raise CommandError(f'Произошла ошибка: {error}')
+
+    def import_file(self, model, path, fields, batch_size, use_copy):
+        load = self.copy_rows if use_copy else self.insert_rows
+        before = model.objects.count()
+        start = time.perf_counter()
+        processed = 0
+        for chunk in chunked(read_rows(path, fields), batch_size):
+            load(model, fields, chunk)
+            processed += len(chunk)
+            self.stdout.write(
+                f'{os.path.basename(path)}: {processed} строк, '
+                f'{processed / (time.perf_counter() - start):.0f} строк/с')
+        if use_copy and processed:
+            self.flush_copied(model, fields)
+        added = model.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f'Файл {os.path.basename(path)} успешно импортирован: '
+            f'добавлено {added}, пропущено {processed - added} '
+            f'за {time.perf_counter() - start:.2f} с'))
+
+    def insert_rows(self, model, fields, chunk):
+        model.objects.bulk_create(
+            (model(**dict(zip(fields, row))) for row in chunk),
+            batch_size=len(chunk),
+            ignore_conflicts=True)
+
+    def copy_table(self, model):
+        return f'import_{model._meta.db_table}'
+
+    def copy_rows(self, model, fields, chunk):
+        table = self.copy_table(model)
+        columns = ', '.join(fields)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(chunk)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE IF NOT EXISTS {table} ON COMMIT DROP '
+                f'AS SELECT {columns} FROM {model._meta.db_table} '
+                f'WITH NO DATA')
+            cursor.copy_expert(
+                f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                buffer)
+
+    def flush_copied(self, model, fields):
+        table = self.copy_table(model)
+        columns = ', '.join(fields)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {model._meta.db_table} ({columns}) '
+                f'SELECT {columns} FROM {table} ON CONFLICT DO NOTHING')
+            cursor.execute(f'DROP TABLE {table}')
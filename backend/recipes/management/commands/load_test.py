@@ -0,0 +1,158 @@
+import http.client
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from api.short_links import encode
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+# имя, вес, метод, путь, тело, нужна ли авторизация
+PROFILE = (
+    ('recipes list', 30, 'GET', '/api/recipes/?page={page}', None, False),
+    ('recipes by tag', 8, 'GET', '/api/recipes/?tags={tag}', None, False),
+    ('recipe detail', 20, 'GET', '/api/recipes/{recipe}/', None, False),
+    ('recipe detail auth', 10, 'GET', '/api/recipes/{recipe}/', None, True),
+    ('feed', 5, 'GET', '/api/recipes/feed/', None, True),
+    ('ingredients autocomplete', 8, 'GET',
+     '/api/ingredients/autocomplete/?name={ingredient}', None, False),
+    ('tags', 3, 'GET', '/api/tags/', None, False),
+    ('subscriptions', 3, 'GET', '/api/users/subscriptions/?recipes_limit=3',
+     None, True),
+    ('favorite add', 3, 'POST', '/api/recipes/favorite/', 'recipes', True),
+    ('favorite remove', 3, 'DELETE', '/api/recipes/favorite/', 'recipes',
+     True),
+    ('shopping list', 2, 'GET', '/api/shopping-list/', None, True),
+    ('download shopping cart', 1, 'GET',
+     '/api/recipes/download_shopping_cart/', None, True),
+    ('short link', 4, 'GET', '/s/{short_link}/', None, False),
+)
+
+
+def percentile(values, share):
+    """Значение, ниже которого лежит доля share отсортированных values."""
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = ('Нагружает запущенный сервер смесью реальных запросов к API и '
+            'выводит p50/p95/p99 по каждому эндпоинту. Данные для запросов '
+            'берутся из базы, например, созданные generate_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000',
+            help='Адрес сервера.')
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30,
+            help='Длительность нагрузки в секундах.')
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=10,
+            help='Количество одновременных клиентов.')
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=50,
+            help='Количество пользователей, от имени которых идут запросы.')
+        parser.add_argument(
+            '--prefix',
+            default='synthetic',
+            help='Префикс пользователей из generate_data.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        target = urlsplit(options['url'])
+        users = list(User.objects.filter(
+            username__startswith=f'{options["prefix"]}-'
+        )[:options['users']])
+        if not users:
+            raise CommandError(
+                'Нет пользователей для нагрузки, сначала выполните '
+                'generate_data.')
+        self.tokens = [
+            Token.objects.get_or_create(user=user)[0].key for user in users]
+        self.recipes = list(Recipe.objects.values_list('pk', flat=True))
+        self.tags = list(Tag.objects.values_list('slug', flat=True))
+        self.ingredients = list(
+            Ingredient.objects.values_list('name', flat=True)[:500])
+        self.pages = max(1, len(self.recipes) // 6)
+        self.weights = [scenario[1] for scenario in PROFILE]
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            for worker in range(options['concurrency']):
+                executor.submit(
+                    self.run_client, target, deadline,
+                    random.Random(options['seed'] + worker))
+        self.report(time.perf_counter() - start)
+
+    def run_client(self, target, deadline, rng):
+        connection = http.client.HTTPConnection(
+            target.hostname, target.port or 80, timeout=30)
+        token = rng.choice(self.tokens)
+        while time.monotonic() < deadline:
+            name, _, method, path, body, auth = rng.choices(
+                PROFILE, weights=self.weights)[0]
+            recipe = rng.choice(self.recipes)
+            path = quote(path.format(
+                page=rng.randint(1, min(self.pages, 10)),
+                recipe=recipe,
+                tag=rng.choice(self.tags),
+                ingredient=rng.choice(self.ingredients)[:4],
+                short_link=encode(recipe)), safe='/?=&')
+            headers = {'Accept': 'application/json'}
+            if auth:
+                headers['Authorization'] = f'Token {token}'
+            if body:
+                body = json.dumps({body: rng.sample(
+                    self.recipes, min(5, len(self.recipes)))})
+                headers['Content-Type'] = 'application/json'
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                response.read()
+                failed = response.status >= 400
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                failed = True
+            elapsed = (time.perf_counter() - start) * 1000
+            with self.lock:
+                self.latencies[name].append(elapsed)
+                self.errors[name] += failed
+        connection.close()
+
+    def report(self, elapsed):
+        self.stdout.write(
+            f'{"эндпоинт":<26} {"запросов":>8} {"ошибок":>6} {"rps":>7} '
+            f'{"p50":>7} {"p95":>7} {"p99":>7}')
+        total = 0
+        for name, *_ in PROFILE:
+            values = sorted(self.latencies[name])
+            if not values:
+                continue
+            total += len(values)
+            self.stdout.write(
+                f'{name:<26} {len(values):>8} {self.errors[name]:>6} '
+                f'{len(values) / elapsed:>7.1f} '
+                f'{percentile(values, 0.5):>7.1f} '
+                f'{percentile(values, 0.95):>7.1f} '
+                f'{percentile(values, 0.99):>7.1f}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего запросов: {total} за {elapsed:.1f} с, '
+            f'{total / elapsed:.1f} в секунду, время в мс'))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.models import IngredientInRecipe, ShoppingCart, ShoppingListItem
+
+LIST_TABLE = ShoppingListItem._meta.db_table
+EXPECTED_SQL = (
+    f'SELECT cart.user_id, item.ingredient_id, SUM(item.amount) AS total '
+    f'FROM {ShoppingCart._meta.db_table} AS cart '
+    f'JOIN {IngredientInRecipe._meta.db_table} AS item '
+    f'ON item.recipe_id = cart.recipe_id '
+    f'GROUP BY cart.user_id, item.ingredient_id')
+DRIFT_SQL = (
+    f'WITH expected AS ({EXPECTED_SQL}) '
+    f'SELECT COUNT(*) FROM expected '
+    f'FULL OUTER JOIN {LIST_TABLE} AS list '
+    f'ON list.user_id = expected.user_id '
+    f'AND list.ingredient_id = expected.ingredient_id '
+    f'WHERE list.total IS DISTINCT FROM expected.total')
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает суммарные списки покупок из корзин. '
+            'С --check только проверяет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Завершиться с ошибкой, если списки расходятся с корзинами.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(DRIFT_SQL)
+            drift, = cursor.fetchone()
+            if options['check']:
+                if drift:
+                    raise CommandError(
+                        f'Расхождений в списках покупок: {drift}')
+                self.stdout.write(self.style.SUCCESS(
+                    'Списки покупок совпадают с корзинами'))
+                return
+            cursor.execute(f'DELETE FROM {LIST_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {LIST_TABLE} (user_id, ingredient_id, total) '
+                f'{EXPECTED_SQL}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, исправлено строк: {drift}'))
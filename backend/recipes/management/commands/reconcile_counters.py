@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+# модель, поле счётчика, считаемая модель, её внешний ключ
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+)
+
+
+def actual_count(related, foreign_key):
+    return Coalesce(Subquery(
+        related.objects.filter(**{foreign_key: OuterRef('pk')}).order_by(
+        ).values(foreign_key).annotate(total=Count('pk')).values('total')), 0)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики и исправляет расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать количество расхождений.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for model, field, related, foreign_key in COUNTERS:
+                drifted = model.objects.annotate(
+                    actual=actual_count(related, foreign_key)).exclude(
+                    actual=F(field)).values('pk')
+                if options['dry_run']:
+                    fixed = drifted.count()
+                else:
+                    fixed = model.objects.filter(pk__in=drifted).update(
+                        **{field: actual_count(related, foreign_key)})
+                self.stdout.write(
+                    f'{model.__name__}.{field}: расхождений {fixed}')
@@ -0,0 +1,81 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from recipes.models import Recipe, RecipeRating
+
+DEFAULT_BATCH_SIZE = 1000
+UPDATE_FIELDS = (
+    'favorites_count',
+    'in_carts_count',
+    'popular_score',
+    'trending_score',
+    'updated_at',
+)
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рейтинги рецептов, у которых изменились '
+            'счётчики избранного и списка покупок. Запускается по '
+            'расписанию, например, из cron раз в несколько минут.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать все рейтинги, например, после смены весов.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Количество рейтингов в одной пачке записи.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        batch_size = options['batch_size']
+        missing = Recipe.objects.filter(rating__isnull=True).order_by(
+        ).values_list('pk', 'favorites_count', 'in_carts_count', 'pub_date')
+        changed = RecipeRating.objects.values_list(
+            'recipe_id',
+            'recipe__favorites_count',
+            'recipe__in_carts_count',
+            'recipe__pub_date')
+        if not options['full']:
+            changed = changed.filter(
+                ~Q(favorites_count=F('recipe__favorites_count'))
+                | ~Q(in_carts_count=F('recipe__in_carts_count')))
+        with transaction.atomic():
+            created = self.write(
+                missing, batch_size,
+                lambda ratings: RecipeRating.objects.bulk_create(
+                    ratings, ignore_conflicts=True))
+            updated = self.write(
+                changed, batch_size,
+                lambda ratings: RecipeRating.objects.bulk_update(
+                    ratings, UPDATE_FIELDS))
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинги пересчитаны: создано {created}, обновлено {updated} '
+            f'за {time.perf_counter() - start:.2f} с'))
+
+    def write(self, rows, batch_size, save):
+        total = 0
+        batch = []
+        now = timezone.now()
+        for recipe_id, favorites_count, in_carts_count, pub_date in (
+                rows.iterator(chunk_size=batch_size)):
+            batch.append(RecipeRating(
+                recipe_id=recipe_id,
+                updated_at=now,
+                **RecipeRating.calculate(
+                    favorites_count, in_carts_count, pub_date)))
+            if len(batch) == batch_size:
+                save(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            save(batch)
+            total += len(batch)
+        return total
@@ -0,0 +1,25 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_ingredient_unique_ingredient'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(
+            sql=(
+                'CREATE INDEX ingredient_name_prefix_idx '
+                'ON recipes_ingredient (UPPER(name) text_pattern_ops);'
+                'CREATE INDEX ingredient_name_trgm_idx '
+                'ON recipes_ingredient USING gin (UPPER(name) gin_trgm_ops);'
+            ),
+            reverse_sql=(
+                'DROP INDEX ingredient_name_trgm_idx;'
+                'DROP INDEX ingredient_name_prefix_idx;'
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.3 on 2026-10-18 03:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeRating',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('popular_score', models.FloatField(db_index=True, default=0, verbose_name='Популярность')),
+                ('trending_score', models.FloatField(db_index=True, default=0, verbose_name='Популярность с учётом давности')),
+                ('favorites_count', models.PositiveIntegerField(default=0, verbose_name='Учтено добавлений в избранное')),
+                ('in_carts_count', models.PositiveIntegerField(default=0, verbose_name='Учтено добавлений в список покупок')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата пересчёта')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+            },
+        ),
+    ]
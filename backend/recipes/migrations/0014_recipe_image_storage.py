@@ -0,0 +1,19 @@
+# Generated by Django 3.2.3 on 2026-10-18 03:43
+
+from django.db import migrations, models
+import recipes.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_author_pub_date_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(storage=recipes.images.ContentAddressedStorage(), upload_to='recipes', verbose_name='Изображение'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.3 on 2026-10-18 03:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0014_recipe_image_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент в списке покупок',
+                'verbose_name_plural': 'Списки покупок',
+                'default_related_name': 'shopping_list',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_list_item'),
+        ),
+        migrations.RunSQL(
+            sql=(
+                'INSERT INTO recipes_shoppinglistitem '
+                '(user_id, ingredient_id, total) '
+                'SELECT cart.user_id, item.ingredient_id, SUM(item.amount) '
+                'FROM recipes_shoppingcart AS cart '
+                'JOIN recipes_ingredientinrecipe AS item '
+                'ON item.recipe_id = cart.recipe_id '
+                'GROUP BY cart.user_id, item.ingredient_id;'
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.3 on 2026-10-18 03:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0015_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='favorite',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='favorites', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recipes', to=settings.AUTH_USER_MODEL, verbose_name='Автор рецепта'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.RunSQL(
+            sql=(
+                'CREATE INDEX recipe_tags_tag_recipe_idx '
+                'ON recipes_recipe_tags (tag_id, recipe_id);'
+                'DROP INDEX IF EXISTS recipes_recipe_tags_tag_id_6fe328c4;'
+            ),
+            reverse_sql=(
+                'CREATE INDEX recipes_recipe_tags_tag_id_6fe328c4 '
+                'ON recipes_recipe_tags (tag_id);'
+                'DROP INDEX recipe_tags_tag_recipe_idx;'
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.3 on 2026-10-18 04:13
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, editable=False, size=None, verbose_name='Id ингредиентов'),
+        ),
+        migrations.RunSQL(
+            sql=(
+                'UPDATE recipes_recipe AS recipe SET ingredient_ids = '
+                'COALESCE((SELECT array_agg(item.ingredient_id '
+                'ORDER BY item.ingredient_id) '
+                'FROM recipes_ingredientinrecipe AS item '
+                'WHERE item.recipe_id = recipe.id), ARRAY[]::bigint[])'
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['ingredient_ids'], name='recipe_ingredient_ids_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+import math
+
+from django.db import migrations
+
+FAVORITE_WEIGHT = 1.0
+SHOPPING_CART_WEIGHT = 1.5
+TRENDING_HALF_LIFE = 7 * 24 * 60 * 60
+BATCH_SIZE = 1000
+
+
+def fill_ratings(apps, schema_editor):
+    """Рейтинги рецептов без рейтинга по счётчикам из 0011.
+
+    Формула повторяет RecipeRating.calculate на момент миграции.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeRating = apps.get_model('recipes', 'RecipeRating')
+    rows = Recipe.objects.filter(rating__isnull=True).order_by().values_list(
+        'pk', 'favorites_count', 'in_carts_count', 'pub_date')
+    batch = []
+    for pk, favorites_count, in_carts_count, pub_date in rows.iterator(
+            chunk_size=BATCH_SIZE):
+        popular_score = (
+            favorites_count * FAVORITE_WEIGHT
+            + in_carts_count * SHOPPING_CART_WEIGHT)
+        batch.append(RecipeRating(
+            recipe_id=pk,
+            favorites_count=favorites_count,
+            in_carts_count=in_carts_count,
+            popular_score=popular_score,
+            trending_score=(
+                math.log2(1 + popular_score)
+                + pub_date.timestamp() / TRENDING_HALF_LIFE)))
+        if len(batch) == BATCH_SIZE:
+            RecipeRating.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    RecipeRating.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0018_recipe_ingredient_ids'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_ratings, migrations.RunPython.noop),
+    ]
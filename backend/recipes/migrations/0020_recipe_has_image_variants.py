@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0019_fill_recipe_ratings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='has_image_variants',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Уменьшенные копии изображения созданы'),
+        ),
+    ]
@@ -1,16 +1,58 @@
+import math
+
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.aggregates import ArrayAgg, StringAgg
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core import validators
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import (
+    BigIntegerField,
+    BooleanField,
+    Case,
+    CharField,
+    Count,
+    Exists,
+    F,
+    FloatField,
+    Func,
+    IntegerField,
+    Min,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Sum,
+    Value,
+    When,
+    Window
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import (
+    Coalesce,
+    Greatest,
+    Length,
+    Lower,
+    RowNumber,
+    Trim
+)
 
 from api.constants import (
+    FAVORITE_WEIGHT,
     MAX_NAME_LENGTH,
     MAX_NAME_ING_LENGTH,
     MAX_TAG_LENGTH,
     MAX_UNIT_ING_LENGTH,
     MIN_VALUE_VALID,
-    REGEX_SLUG
+    REGEX_SLUG,
+    SEARCH_CONFIG,
+    SHOPPING_CART_WEIGHT,
+    TRENDING_HALF_LIFE,
+    TRIGRAM_MIN_LENGTH,
+    UNIT_CONVERSIONS
 )
+from recipes.images import ContentAddressedStorage
 
 
 User = get_user_model()
@@ -41,6 +83,26 @@ class Tag(models.Model):
         return self.name
 
 
+class IngredientQuerySet(models.QuerySet):
+    """Запросы к ингредиентам."""
+
+    def autocomplete(self, name):
+        """Ищет ингредиенты по началу, затем по вхождению в название.
+
+        Короткие запросы ищутся только по началу названия: для них
+        триграммный индекс не сужает выборку.
+        """
+        if len(name) < TRIGRAM_MIN_LENGTH:
+            return self.filter(name__istartswith=name).order_by(
+                Length('name'), 'name')
+        return self.filter(name__icontains=name).annotate(
+            is_substring=Case(
+                When(name__istartswith=name, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField())
+        ).order_by('is_substring', Length('name'), 'name')
+
+
 class Ingredient(models.Model):
     """Описание модели ингредиентов."""
 
@@ -57,6 +119,8 @@ class Ingredient(models.Model):
         null=False
     )
 
+    objects = IngredientQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
@@ -68,6 +132,161 @@ class Ingredient(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'name' in field_names:
+            instance.saved_name = values[field_names.index('name')]
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if 'name' not in self.get_deferred_fields():
+            self.saved_name = self.name
+
+    def name_changed(self):
+        """Название отличается от сохранённого в базе."""
+        if 'name' in self.get_deferred_fields():
+            return False
+        return self.name != getattr(self, 'saved_name', None)
+
+
+class ArrayLength(Func):
+    """Длина одномерного массива, для пустого массива 0."""
+
+    function = 'cardinality'
+    output_field = IntegerField()
+
+
+class MissingElements(Func):
+    """Число элементов первого массива, которых нет во втором."""
+
+    template = 'cardinality(ARRAY(SELECT unnest(%(expressions)s)))'
+    arg_joiner = ') EXCEPT SELECT unnest('
+    output_field = IntegerField()
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Запросы к рецептам, подготовленные для сериализаторов."""
+
+    def with_related(self):
+        """Подгружает теги и ингредиенты фиксированным числом запросов.
+
+        Поисковые поля ответам не нужны и не загружаются.
+        """
+        return self.without_search_fields().prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient_in_recipes',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient')))
+
+    def with_user_flags(self, user):
+        """Аннотирует флаги избранного, корзины и подписки на автора."""
+        author = Prefetch(
+            'author', queryset=User.objects.with_is_subscribed(user))
+        if user is None or not user.is_authenticated:
+            return self.prefetch_related(author).annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()))
+        return self.prefetch_related(author).annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))))
+
+    def without_search_fields(self):
+        """Откладывает загрузку поискового вектора и массива ингредиентов."""
+        return self.defer(*Recipe.search_fields)
+
+    def update_search_fields(self):
+        """Пересчитывает поисковый вектор и массив id ингредиентов.
+
+        В векторе название весит A, названия ингредиентов B, описание C.
+        Оба поля обновляются одним UPDATE.
+        """
+        ingredients = IngredientInRecipe.objects.filter(
+            recipe=OuterRef('pk')).values('recipe')
+        ingredient_names = ingredients.annotate(
+            names=StringAgg('ingredient__name', ' ')).values('names')
+        ingredient_ids = ingredients.annotate(ids=ArrayAgg(
+            'ingredient_id', ordering='ingredient_id')).values('ids')
+        return self.update(
+            search_vector=(
+                SearchVector('name', weight='A', config=SEARCH_CONFIG)
+                + SearchVector(
+                    Subquery(ingredient_names),
+                    weight='B',
+                    config=SEARCH_CONFIG)
+                + SearchVector('text', weight='C', config=SEARCH_CONFIG)),
+            ingredient_ids=Coalesce(
+                Subquery(ingredient_ids),
+                Value([], output_field=ArrayField(BigIntegerField()))))
+
+    def with_tags(self, tag_ids, mode):
+        """Отбирает рецепты хотя бы с одним (any) или со всеми (all) тегами.
+
+        Теги проверяются подзапросом к таблице связей, поэтому рецепты
+        не дублируются и DISTINCT по всей строке рецепта не нужен.
+        """
+        recipe_tags = Recipe.tags.through.objects.filter(tag_id__in=tag_ids)
+        if mode == 'all':
+            return self.filter(pk__in=recipe_tags.values('recipe_id').annotate(
+                tags_count=Count('tag_id')).filter(
+                tags_count=len(set(tag_ids))).values('recipe_id'))
+        return self.filter(
+            Exists(recipe_tags.filter(recipe_id=OuterRef('pk'))))
+
+    def with_ingredients(self, ingredient_ids, mode, missing=0):
+        """Отбирает рецепты по имеющимся у пользователя ингредиентам.
+
+        all - в рецепте есть все ингредиенты, any - хотя бы один,
+        only - рецепту не хватает не больше missing ингредиентов.
+        Поиск идёт по GIN-индексу массива ingredient_ids, а
+        missing_ingredients и matched_ingredients задают порядок.
+        """
+        ingredient_ids = sorted(set(ingredient_ids))
+        if mode == 'all':
+            queryset = self.filter(ingredient_ids__contains=ingredient_ids)
+        elif mode == 'only' and not missing:
+            # пустой массив входит в любой, рецепт без ингредиентов
+            # не должен подходить к любому набору
+            queryset = self.filter(
+                ingredient_ids__contained_by=ingredient_ids,
+                ingredient_ids__len__gt=0)
+        else:
+            queryset = self.filter(ingredient_ids__overlap=ingredient_ids)
+        queryset = queryset.annotate(missing_ingredients=MissingElements(
+            'ingredient_ids',
+            Value(ingredient_ids, output_field=ArrayField(BigIntegerField()))))
+        queryset = queryset.annotate(matched_ingredients=(
+            ArrayLength('ingredient_ids') - F('missing_ingredients')))
+        if mode == 'only' and missing:
+            queryset = queryset.filter(missing_ingredients__lte=missing)
+        if mode == 'any':
+            return queryset.order_by(
+                '-matched_ingredients', 'missing_ingredients',
+                '-pub_date', '-id')
+        return queryset.order_by(
+            'missing_ingredients', '-matched_ingredients',
+            '-pub_date', '-id')
+
+    def limit_per_author(self, limit):
+        """Оставляет не больше limit последних рецептов каждого автора.
+
+        Номер рецепта внутри автора считается оконной функцией
+        ROW_NUMBER(), поэтому выборка для всех авторов - один запрос.
+        """
+        ranked = self.annotate(author_rank=Window(
+            expression=RowNumber(),
+            partition_by=[F('author')],
+            order_by=[F('pub_date').desc(), F('id').desc()],
+        )).values('pk', 'author_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(pk__in=RawSQL(
+            f'SELECT id FROM ({sql}) AS ranked WHERE author_rank <= %s',
+            (*params, limit)))
+
 
 class Recipe(models.Model):
     """Описание модели рецептов."""
@@ -83,7 +302,8 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         verbose_name='Изображение',
-        upload_to='recipes'
+        upload_to='recipes',
+        storage=ContentAddressedStorage()
     )
     name = models.CharField(
         max_length=MAX_NAME_LENGTH,
@@ -99,22 +319,157 @@ class Recipe(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        verbose_name='Автор рецепта'
+        verbose_name='Автор рецепта',
+        # поиск по автору идёт через recipe_author_pub_date_idx
+        db_index=False
     )
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в список покупок',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False
+    )
+    ingredient_ids = ArrayField(
+        models.BigIntegerField(),
+        verbose_name='Id ингредиентов',
+        default=list,
+        editable=False
+    )
+    has_image_variants = models.BooleanField(
+        verbose_name='Уменьшенные копии изображения созданы',
+        default=False,
+        editable=False
+    )
+
+    # служебные поля поиска, пересчитываются update_search_fields
+    search_fields = ('search_vector', 'ingredient_ids')
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         default_related_name = 'recipes'
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'),
+            GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+            GinIndex(
+                fields=['ingredient_ids'],
+                name='recipe_ingredient_ids_idx')]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'image' in field_names:
+            instance.saved_image = values[field_names.index('image')]
+        return instance
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and self.image_changed():
+            # у нового изображения вариантов ещё нет
+            self.has_image_variants = False
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {
+                    *kwargs['update_fields'], 'has_image_variants'}
+        super().save(*args, **kwargs)
+        if 'image' not in self.get_deferred_fields():
+            self.saved_image = self.image.name
+
+    def image_changed(self):
+        """Изображение отличается от сохранённого в базе."""
+        if 'image' in self.get_deferred_fields():
+            return False
+        return self.image.name != getattr(self, 'saved_image', None)
+
+
+class UserRecipeQuerySet(models.QuerySet):
+    """Массовое добавление и удаление рецептов из списков пользователя.
+
+    INSERT и DELETE без загрузки объектов не вызывают сигналы,
+    поэтому счётчик рецепта counter_field меняется здесь же.
+    """
+
+    def add_recipes(self, user, recipe_ids):
+        """Добавляет рецепты одним запросом.
+
+        Возвращает id добавленных и уже бывших в списке. Добавленные
+        берутся из RETURNING, поэтому параллельный запрос с теми же
+        рецептами не увеличит счётчики второй раз.
+        """
+        recipe_ids = list(dict.fromkeys(recipe_ids))
+        if not recipe_ids:
+            return [], set()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {self.model._meta.db_table} '
+                f'(user_id, recipe_id) VALUES '
+                f'{", ".join(["(%s, %s)"] * len(recipe_ids))} '
+                f'ON CONFLICT (user_id, recipe_id) DO NOTHING '
+                f'RETURNING recipe_id',
+                [value for pk in recipe_ids for value in (user.pk, pk)])
+            inserted = {recipe_id for recipe_id, in cursor.fetchall()}
+            created = [pk for pk in recipe_ids if pk in inserted]
+            existing = set(recipe_ids) - inserted
+            field = self.model.counter_field
+            Recipe.objects.filter(pk__in=created).update(
+                **{field: F(field) + 1})
+        return created, existing
+
+    def remove_recipes(self, user, recipe_ids):
+        """Удаляет рецепты одним запросом, возвращает id удалённых."""
+        if not recipe_ids:
+            return []
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.model._meta.db_table} '
+                f'WHERE user_id = %s AND recipe_id IN '
+                f'({", ".join(["%s"] * len(recipe_ids))}) '
+                f'RETURNING recipe_id',
+                [user.pk, *recipe_ids])
+            deleted = [recipe_id for recipe_id, in cursor.fetchall()]
+            field = self.model.counter_field
+            Recipe.objects.filter(pk__in=deleted).update(
+                **{field: Greatest(F(field) - 1, 0)})
+        return deleted
+
+
+class ShoppingCartQuerySet(UserRecipeQuerySet):
+    """Массовые операции с корзиной, обновляющие список покупок."""
+
+    def add_recipes(self, user, recipe_ids):
+        with transaction.atomic():
+            created, existing = super().add_recipes(user, recipe_ids)
+            ShoppingListItem.objects.add_recipes(user.pk, created)
+        return created, existing
+
+    def remove_recipes(self, user, recipe_ids):
+        with transaction.atomic():
+            deleted = super().remove_recipes(user, recipe_ids)
+            ShoppingListItem.objects.add_recipes(user.pk, deleted, sign=-1)
+        return deleted
+
 
 class ShoppingCart(models.Model):
     """Описание модели списка покупок."""
@@ -127,9 +482,15 @@ class ShoppingCart(models.Model):
     user = models.ForeignKey(
         User,
         verbose_name='Пользователь',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        # поиск по пользователю идёт через уникальный индекс (user, recipe)
+        db_index=False
     )
 
+    counter_field = 'in_carts_count'
+
+    objects = ShoppingCartQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Корзина'
         verbose_name_plural = 'Корзины'
@@ -156,9 +517,15 @@ class Favorite(models.Model):
     user = models.ForeignKey(
         User,
         verbose_name='Пользователь',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        # поиск по пользователю идёт через уникальный индекс (user, recipe)
+        db_index=False
     )
 
+    counter_field = 'favorites_count'
+
+    objects = UserRecipeQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранные рецепты'
@@ -206,3 +573,193 @@ class IngredientInRecipe(models.Model):
             f'Ингредиент {self.ingredient}'
             f' в кол-ве: {self.amount}'
             f' добавлен в рецепт {self.recipe}')
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+    """Инкрементальное обновление списков покупок.
+
+    Изменения применяются одним INSERT ... ON CONFLICT DO UPDATE,
+    строки с нулевым количеством удаляются.
+    """
+
+    def add_recipes(self, user_id, recipe_ids, sign=1):
+        """Прибавляет (sign=-1 - вычитает) ингредиенты рецептов."""
+        if not recipe_ids:
+            return
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, ingredient_id, total) '
+                f'SELECT %s, ingredient_id, %s * SUM(amount) '
+                f'FROM {IngredientInRecipe._meta.db_table} '
+                f'WHERE recipe_id IN '
+                f'({", ".join(["%s"] * len(recipe_ids))}) '
+                f'GROUP BY ingredient_id '
+                f'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                f'SET total = {table}.total + EXCLUDED.total',
+                [user_id, sign, *recipe_ids])
+        if sign < 0:
+            self.filter(user_id=user_id, total__lte=0).delete()
+
+    def remove_recipe(self, recipe_id):
+        """Вычитает рецепт из списков всех корзин, где он лежит."""
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET total = {table}.total - item.amount '
+                f'FROM {ShoppingCart._meta.db_table} AS cart, '
+                f'{IngredientInRecipe._meta.db_table} AS item '
+                f'WHERE cart.recipe_id = %s '
+                f'AND item.recipe_id = cart.recipe_id '
+                f'AND {table}.user_id = cart.user_id '
+                f'AND {table}.ingredient_id = item.ingredient_id',
+                [recipe_id])
+            changed = cursor.rowcount
+        if changed:
+            self.filter(
+                user__shopping_cart__recipe_id=recipe_id,
+                total__lte=0).delete()
+
+    def change_recipe(self, recipe_id, deltas):
+        """Применяет изменения ингредиентов рецепта ко всем корзинам.
+
+        deltas - словарь {id ингредиента: изменение количества}.
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, ingredient_id, total) '
+                f'SELECT cart.user_id, delta.ingredient_id, delta.total '
+                f'FROM {ShoppingCart._meta.db_table} AS cart, '
+                f'(VALUES {", ".join(["(%s, %s)"] * len(deltas))}) '
+                f'AS delta (ingredient_id, total) '
+                f'WHERE cart.recipe_id = %s '
+                f'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                f'SET total = {table}.total + EXCLUDED.total',
+                [*(value for item in deltas.items() for value in item),
+                 recipe_id])
+        if any(delta < 0 for delta in deltas.values()):
+            self.filter(
+                user__shopping_cart__recipe_id=recipe_id,
+                ingredient_id__in=deltas,
+                total__lte=0).delete()
+
+    def normalized(self):
+        """Суммирует список по названию и канонической единице.
+
+        Перевод в каноническую единицу выполняется в том же запросе,
+        поэтому «мука, г» и «Мука, кг» дают одну строку в граммах.
+        """
+        unit = Lower(Trim('ingredient__measurement_unit'))
+        factor = Case(
+            *(When(unit=name, then=Value(multiplier))
+              for name, (_, multiplier) in UNIT_CONVERSIONS.items()),
+            default=Value(1),
+            output_field=FloatField())
+        canonical_unit = Case(
+            *(When(unit=name, then=Value(canonical))
+              for name, (canonical, _) in UNIT_CONVERSIONS.items()),
+            default=F('unit'),
+            output_field=CharField())
+        return self.annotate(unit=unit).values(
+            key=Lower(Trim('ingredient__name')),
+            units=canonical_unit).annotate(
+            name=Min('ingredient__name'),
+            amount=Sum(F('total') * factor, output_field=FloatField())
+        ).order_by('key', 'units')
+
+
+class ShoppingListItem(models.Model):
+    """Описание модели суммарного списка покупок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE
+    )
+    total = models.IntegerField(verbose_name='Количество')
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Списки покупок'
+        default_related_name = 'shopping_list'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item')]
+
+    def __str__(self):
+        return f'{self.ingredient} - {self.total} у {self.user}'
+
+
+class RecipeRating(models.Model):
+    """Описание модели предрассчитанного рейтинга рецепта."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating'
+    )
+    popular_score = models.FloatField(
+        verbose_name='Популярность',
+        default=0,
+        db_index=True
+    )
+    trending_score = models.FloatField(
+        verbose_name='Популярность с учётом давности',
+        default=0,
+        db_index=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Учтено добавлений в избранное',
+        default=0
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='Учтено добавлений в список покупок',
+        default=0
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата пересчёта',
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+
+    def __str__(self):
+        return f'Рейтинг рецепта {self.recipe_id}: {self.popular_score}'
+
+    @staticmethod
+    def calculate(favorites_count, in_carts_count, pub_date):
+        """Считает популярность и популярность с затуханием.
+
+        Затухание хранится в логарифмической шкале: вес делится пополам
+        каждые TRENDING_HALF_LIFE секунд с момента публикации, поэтому
+        порядок рецептов не меняется со временем и пересчитывать нужно
+        только рецепты с изменившимися счётчиками.
+        """
+        popular_score = (
+            favorites_count * FAVORITE_WEIGHT
+            + in_carts_count * SHOPPING_CART_WEIGHT)
+        trending_score = (
+            math.log2(1 + popular_score)
+            + pub_date.timestamp() / TRENDING_HALF_LIFE)
+        return {
+            'favorites_count': favorites_count,
+            'in_carts_count': in_carts_count,
+            'popular_score': popular_score,
+            'trending_score': trending_score,
+        }
@@ -0,0 +1,132 @@
+from threading import local
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes.images import schedule_variants
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeRating,
+    ShoppingCart,
+    ShoppingListItem,
+    User
+)
+
+
+_deleting = local()
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет счётчик, не опуская его ниже нуля."""
+    change_counters(model.objects.filter(pk=pk), field, delta)
+
+
+def change_counters(queryset, field, delta):
+    """Изменяет счётчик у всех строк queryset одним UPDATE."""
+    queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def deleting(model):
+    """pk объектов model, которые сейчас удаляются в этом потоке.
+
+    Collector отправляет pre_delete всем объектам до первого DELETE, а
+    post_delete родителя - после post_delete каскадно удалённых строк.
+    Поэтому строки, удаляемые вместе с рецептом или пользователем,
+    видят родителя здесь и не меняют счётчики по одной: это делает
+    pre_delete родителя одним запросом или счётчик удаляется с ним.
+    """
+    registry = getattr(_deleting, 'registry', None)
+    if registry is None:
+        registry = _deleting.registry = {}
+    return registry.setdefault(model, set())
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    if cascaded(instance):
+        return
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+def cascaded(instance):
+    """Строка списка удаляется вместе с рецептом или пользователем."""
+    return (instance.recipe_id in deleting(Recipe)
+            or instance.user_id in deleting(User))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'in_carts_count', 1)
+        ShoppingListItem.objects.add_recipes(
+            instance.user_id, [instance.recipe_id])
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, **kwargs):
+    # список покупок удалённого пользователя удаляется каскадом,
+    # удалённый рецепт вычитается из всех корзин в recipe_deleting
+    if cascaded(instance):
+        return
+    ShoppingListItem.objects.add_recipes(
+        instance.user_id, [instance.recipe_id], sign=-1)
+    change_counter(Recipe, instance.recipe_id, 'in_carts_count', -1)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    # saved_name обновляется после post_save, здесь оно ещё старое
+    if not created and instance.name_changed():
+        transaction.on_commit(lambda: Recipe.objects.filter(
+            ingredients=instance).update_search_fields())
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleting(sender, instance, **kwargs):
+    """Запоминает рецепты: связи с ингредиентом удалятся каскадом."""
+    instance.recipe_ids = list(Recipe.objects.filter(
+        ingredients=instance).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    Recipe.objects.filter(
+        pk__in=getattr(instance, 'recipe_ids', ())).update_search_fields()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    # saved_image обновляется после post_save, здесь оно ещё старое
+    if instance.image_changed():
+        image = instance.image
+        transaction.on_commit(lambda: schedule_variants(image))
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+        RecipeRating.objects.create(
+            recipe=instance,
+            **RecipeRating.calculate(0, 0, instance.pub_date))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    """Вычитает рецепт из списков покупок всех корзин одним запросом."""
+    deleting(Recipe).add(instance.pk)
+    ShoppingListItem.objects.remove_recipe(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    deleting(Recipe).discard(instance.pk)
+    if instance.author_id not in deleting(User):
+        change_counter(User, instance.author_id, 'recipes_count', -1)
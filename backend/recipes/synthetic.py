@@ -0,0 +1,180 @@
+"""Генерация синтетических данных для замеров и нагрузочных тестов.
+
+Записи создаются через bulk_create без сигналов, поэтому после
+генерации нужно вызвать finalize(): она пересчитывает счётчики,
+рейтинги, списки покупок и поисковые векторы.
+"""
+import base64
+import io
+import random
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from PIL import Image
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag
+)
+from users.models import Subscription, User
+
+PASSWORD = 'synthetic-password'
+IMAGE = 'recipes/synthetic.png'
+UNITS = ('г', 'г', 'г', 'мл', 'шт.', 'кг', 'ч. л.', 'ст. л.')
+BATCH_SIZE = 5000
+
+
+def tiny_png_base64():
+    """Картинка 1x1 в виде data:image для запросов к API."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (1, 1)).save(buffer, format='PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()).decode()
+
+
+class ZipfSampler:
+    """Выбирает элементы с вероятностью 1 / rank ** exponent.
+
+    Порядок популярности задаётся случайной перестановкой, поэтому
+    популярные записи не совпадают с первыми по id.
+    """
+
+    def __init__(self, population, exponent, rng):
+        self.population = list(population)
+        rng.shuffle(self.population)
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent
+            for rank in range(1, len(self.population) + 1)))
+        self.rng = rng
+
+    def sample(self, count):
+        count = min(count, len(self.population))
+        chosen = set()
+        while len(chosen) < count:
+            chosen.update(self.rng.choices(
+                self.population,
+                cum_weights=self.cum_weights,
+                k=count - len(chosen)))
+        return chosen
+
+
+def create_users(count, prefix='synthetic'):
+    password = make_password(PASSWORD)
+    return User.objects.bulk_create(
+        (User(
+            email=f'{prefix}-{index}@synthetic.local',
+            username=f'{prefix}-{index}',
+            first_name=prefix,
+            last_name=str(index),
+            password=password)
+         for index in range(count)),
+        batch_size=BATCH_SIZE)
+
+
+def create_tags(count, prefix='synthetic'):
+    return Tag.objects.bulk_create(
+        Tag(name=f'{prefix} {index}', slug=f'{prefix}-{index}')
+        for index in range(count))
+
+
+def create_ingredients(count, rng, prefix='synthetic'):
+    return Ingredient.objects.bulk_create(
+        (Ingredient(
+            name=f'{prefix} ингредиент {index}',
+            measurement_unit=rng.choice(UNITS))
+         for index in range(count)),
+        batch_size=BATCH_SIZE)
+
+
+def create_recipes(authors, count, tags, ingredients, rng,
+                   ingredients_per_recipe=(3, 12), tags_per_recipe=(1, 3),
+                   exponent=1.1, prefix='synthetic'):
+    """Рецепты с Zipf-распределением авторов и ингредиентов."""
+    author_sampler = ZipfSampler(authors, exponent, rng)
+    ingredient_sampler = ZipfSampler(ingredients, exponent, rng)
+    recipes = Recipe.objects.bulk_create(
+        (Recipe(
+            author=author_sampler.sample(1).pop(),
+            name=f'{prefix} рецепт {index}',
+            text=f'Синтетический рецепт {index}',
+            cooking_time=rng.randint(5, 180),
+            image=IMAGE)
+         for index in range(count)),
+        batch_size=BATCH_SIZE)
+    IngredientInRecipe.objects.bulk_create(
+        (IngredientInRecipe(
+            recipe=recipe, ingredient=ingredient,
+            amount=rng.randint(1, 500))
+         for recipe in recipes
+         for ingredient in ingredient_sampler.sample(
+             rng.randint(*ingredients_per_recipe))),
+        batch_size=BATCH_SIZE)
+    through = Recipe.tags.through
+    through.objects.bulk_create(
+        (through(recipe=recipe, tag=tag)
+         for recipe in recipes
+         for tag in rng.sample(tags, min(
+             len(tags), rng.randint(*tags_per_recipe)))),
+        batch_size=BATCH_SIZE)
+    return recipes
+
+
+def create_user_recipes(model, users, recipes, per_user, rng,
+                        exponent=1.1):
+    """Избранное или корзины: популярные рецепты выбираются чаще."""
+    sampler = ZipfSampler(recipes, exponent, rng)
+    return model.objects.bulk_create(
+        (model(user=user, recipe=recipe)
+         for user in users
+         for recipe in sampler.sample(rng.randint(0, per_user))),
+        batch_size=BATCH_SIZE)
+
+
+def create_subscriptions(users, per_user, rng, exponent=1.1):
+    sampler = ZipfSampler(users, exponent, rng)
+    return Subscription.objects.bulk_create(
+        (Subscription(user=user, author=author)
+         for user in users
+         for author in sampler.sample(rng.randint(0, per_user))
+         if author != user),
+        batch_size=BATCH_SIZE)
+
+
+def generate(users=100, recipes=1000, tags=8, ingredients=500,
+             favorites_per_user=30, carts_per_user=5,
+             subscriptions_per_user=10, exponent=1.1, seed=0,
+             prefix='synthetic'):
+    """Создаёт связанный набор данных и возвращает созданные записи."""
+    rng = random.Random(seed)
+    data = {
+        'users': create_users(users, prefix),
+        'tags': create_tags(tags, prefix),
+        'ingredients': create_ingredients(ingredients, rng, prefix),
+    }
+    data['recipes'] = create_recipes(
+        data['users'], recipes, data['tags'], data['ingredients'], rng,
+        exponent=exponent, prefix=prefix)
+    data['favorites'] = create_user_recipes(
+        Favorite, data['users'], data['recipes'], favorites_per_user, rng,
+        exponent)
+    data['carts'] = create_user_recipes(
+        ShoppingCart, data['users'], data['recipes'], carts_per_user, rng,
+        exponent)
+    data['subscriptions'] = create_subscriptions(
+        data['users'], subscriptions_per_user, rng, exponent)
+    finalize()
+    return data
+
+
+def finalize():
+    """Пересчитывает данные, которые обычно поддерживают сигналы."""
+    Recipe.objects.update_search_fields()
+    output = io.StringIO()
+    call_command('reconcile_counters', stdout=output)
+    call_command('update_ratings', stdout=output)
+    call_command('rebuild_shopping_lists', stdout=output)
@@ -0,0 +1,40 @@
+import pytest
+from django.db import connection
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from tests import factories
+
+
+@pytest.fixture(scope='session')
+def dataset(django_db_setup, django_db_blocker):
+    """Общие данные сессии, создаются один раз вне транзакций тестов."""
+    with django_db_blocker.unblock():
+        data = factories.create_dataset()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    return data
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """Загруженные в тестах изображения не попадают в media проекта."""
+    settings.MEDIA_ROOT = str(tmp_path)
+
+
+@pytest.fixture
+def api_client(db, dataset):
+    return APIClient()
+
+
+@pytest.fixture
+def user(db, dataset):
+    return factories.create_user('test-user')
+
+
+@pytest.fixture
+def auth_client(user):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
@@ -0,0 +1,46 @@
+"""Фабрики тестовых данных поверх генератора recipes.synthetic."""
+import random
+
+from django.contrib.auth.hashers import make_password
+
+from recipes import synthetic
+from recipes.models import Recipe, RecipeRating
+from users.models import User
+
+# объём общих данных сессии: на нём проверяются бюджеты и планы запросов
+DATASET = {
+    'users': 2000,
+    'recipes': 20000,
+    'tags': 30,
+}
+
+
+def create_dataset(**sizes):
+    """Связанный набор пользователей, рецептов, избранного и подписок."""
+    return synthetic.generate(**{**DATASET, **sizes})
+
+
+def create_user(username, **fields):
+    return User.objects.create(
+        email=f'{username}@test.local',
+        username=username,
+        first_name=username,
+        last_name=username,
+        password=make_password(synthetic.PASSWORD),
+        **fields)
+
+
+def create_recipes(author, count, tags, ingredients, seed=0, prefix='test'):
+    """Рецепты автора с рейтингом, поисковыми полями и счётчиком."""
+    recipes = synthetic.create_recipes(
+        [author], count, tags, ingredients, random.Random(seed),
+        prefix=prefix)
+    pks = [recipe.pk for recipe in recipes]
+    Recipe.objects.filter(pk__in=pks).update_search_fields()
+    RecipeRating.objects.bulk_create(
+        RecipeRating(
+            recipe=recipe, **RecipeRating.calculate(0, 0, recipe.pub_date))
+        for recipe in recipes)
+    User.objects.filter(pk=author.pk).update(
+        recipes_count=Recipe.objects.filter(author=author).count())
+    return list(Recipe.objects.filter(pk__in=pks).order_by('pk'))
@@ -0,0 +1,97 @@
+"""Счётчики и списки покупок при каскадном удалении."""
+import pytest
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import (Favorite, IngredientInRecipe, Recipe,
+                            ShoppingCart, ShoppingListItem)
+from tests import factories
+from users.models import Subscription, User
+
+SIZES = (3, 30)
+
+
+@pytest.fixture
+def recipes(dataset, db):
+    return list(Recipe.objects.order_by('pk')[:SIZES[-1]])
+
+
+def make_users(prefix, count):
+    return [
+        factories.create_user(f'{prefix}-{index}') for index in range(count)]
+
+
+def deletion_queries(instance):
+    with CaptureQueriesContext(connection) as captured:
+        instance.delete()
+    return len(captured)
+
+
+def test_recipe_delete(user, dataset):
+    counts = []
+    for size in SIZES:
+        recipe, = factories.create_recipes(
+            user, 1, dataset['tags'][:1], dataset['ingredients'][:3],
+            prefix=f'cascade-{size}')
+        for fan in make_users(f'fan-{size}', size):
+            Favorite.objects.create(user=fan, recipe=recipe)
+            Subscription.objects.create(user=fan, author=user)
+        recipes_count = User.objects.get(pk=user.pk).recipes_count
+        counts.append(deletion_queries(recipe))
+        assert User.objects.get(pk=user.pk).recipes_count == recipes_count - 1
+    assert counts[0] == counts[1]
+
+
+def test_user_delete(recipes):
+    counts = []
+    author = recipes[0].author
+    for size in SIZES:
+        user = factories.create_user(f'leaving-{size}')
+        Favorite.objects.add_recipes(
+            user, [recipe.pk for recipe in recipes[:size]])
+        ShoppingCart.objects.add_recipes(
+            user, [recipe.pk for recipe in recipes[:size]])
+        Subscription.objects.create(user=user, author=author)
+        for follower in make_users(f'follower-{size}', size):
+            Subscription.objects.create(user=follower, author=user)
+        before = dict(Recipe.objects.filter(pk__in=[
+            recipe.pk for recipe in recipes]).values_list(
+            'pk', 'favorites_count'))
+        followers = User.objects.get(pk=author.pk).followers_count
+        counts.append(deletion_queries(user))
+        after = Recipe.objects.filter(pk__in=before)
+        assert dict(after.values_list('pk', 'favorites_count')) == {
+            pk: count - (pk in {recipe.pk for recipe in recipes[:size]})
+            for pk, count in before.items()}
+        for recipe in after:
+            assert recipe.in_carts_count == recipe.shopping_cart.count()
+        assert User.objects.get(pk=author.pk).followers_count == followers - 1
+    assert counts[0] == counts[1]
+
+
+def shopping_list(user):
+    return dict(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient', 'total'))
+
+
+def expected_shopping_list(user):
+    return dict(IngredientInRecipe.objects.filter(
+        recipe__shopping_cart__user=user).values('ingredient').annotate(
+        total=Sum('amount')).values_list('ingredient', 'total'))
+
+
+def test_recipe_in_carts_delete(user, recipes, dataset):
+    counts = []
+    for size in SIZES:
+        recipe, = factories.create_recipes(
+            user, 1, dataset['tags'][:1], dataset['ingredients'][:5],
+            prefix=f'in-carts-{size}')
+        buyers = make_users(f'buyer-{size}', size)
+        for buyer in buyers:
+            ShoppingCart.objects.add_recipes(
+                buyer, [recipe.pk, recipes[0].pk, recipes[1].pk])
+        counts.append(deletion_queries(recipe))
+        for buyer in buyers:
+            assert shopping_list(buyer) == expected_shopping_list(buyer)
+    assert counts[0] == counts[1]
@@ -0,0 +1,66 @@
+"""Курсорная пагинация сохраняет порядок, заданный фильтрами."""
+import pytest
+
+from recipes.models import RecipeRating
+from users.models import Subscription
+
+QUERIES = (
+    'tags={tag}&ordering=popular',
+    'tags={tag}&ordering=trending',
+    'search={search}',
+    'ingredients={ingredients}&ingredients_mode=any',
+)
+
+
+@pytest.fixture
+def params(dataset):
+    return {
+        'tag': dataset['tags'][0].slug,
+        'search': dataset['ingredients'][3].name.split()[-1],
+        'ingredients': ','.join(
+            str(ingredient.pk) for ingredient in dataset['ingredients'][:3]),
+    }
+
+
+def walk(client, url, link):
+    ids = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        page = [recipe['id'] for recipe in response.data['results']]
+        ids.extend(page if link == 'next' else reversed(page))
+        url = response.data[link]
+    return ids
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_cursor_keeps_filter_ordering(api_client, params, query):
+    query = query.format(**params)
+    listing = api_client.get(f'/api/recipes/?{query}').data
+    forward = walk(
+        api_client, f'/api/recipes/?{query}&pagination=cursor&limit=50',
+        'next')
+    assert len(forward) == len(set(forward)) == listing['count']
+    assert forward[:len(listing['results'])] == [
+        recipe['id'] for recipe in listing['results']]
+    last_page = api_client.get(
+        f'/api/recipes/?{query}&pagination=cursor&limit=50')
+    while last_page.data['next']:
+        last_page = api_client.get(last_page.data['next'])
+    backward = [
+        recipe['id'] for recipe in reversed(last_page.data['results'])]
+    if last_page.data['previous']:
+        backward += walk(api_client, last_page.data['previous'], 'previous')
+    assert backward == forward[::-1]
+
+
+def test_feed_keeps_rating_ordering(auth_client, user, dataset):
+    authors = {recipe.author_id for recipe in dataset['recipes'][:300]}
+    Subscription.objects.bulk_create(
+        Subscription(user=user, author_id=author) for author in authors)
+    response = auth_client.get('/api/recipes/feed/?ordering=popular&limit=20')
+    recipes = [recipe['id'] for recipe in response.data['results']]
+    scores = dict(RecipeRating.objects.filter(
+        recipe__in=recipes).values_list('recipe', 'popular_score'))
+    assert [scores[pk] for pk in recipes] == sorted(
+        scores.values(), reverse=True)
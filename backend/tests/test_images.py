@@ -0,0 +1,91 @@
+"""Декодирование загружаемых изображений."""
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from recipes.images import decode_base64_image, mark_variants_ready
+from recipes.models import Recipe
+from tests import factories
+
+
+def data_uri(image_format, header='png', size=2):
+    buffer = io.BytesIO()
+    Image.new('RGB', (size, size)).save(buffer, format=image_format)
+    return f'data:image/{header};base64,' + base64.b64encode(
+        buffer.getvalue()).decode()
+
+
+@pytest.mark.parametrize('image_format, header, extension', (
+    ('PNG', 'png', 'png'),
+    ('JPEG', 'png', 'jpg'),
+    ('PNG', 'php', 'png'),
+    ('GIF', 'svg+xml', 'gif'),
+))
+def test_extension_from_content(image_format, header, extension):
+    file = decode_base64_image(data_uri(image_format, header))
+    assert file.name == f'image.{extension}'
+
+
+@pytest.mark.parametrize('data', (
+    data_uri('BMP'),
+    data_uri('TIFF'),
+    'data:image/png;base64,' + base64.b64encode(b'not an image').decode(),
+))
+def test_rejected(data):
+    with pytest.raises(ValueError):
+        decode_base64_image(data)
+
+
+@pytest.fixture
+def recipe(user, dataset):
+    """Рецепт со своим изображением, а не общим для данных сессии."""
+    recipe = factories.create_recipes(
+        user, 1, dataset['tags'][:1], dataset['ingredients'][:1])[0]
+    recipe.image = decode_base64_image(data_uri('PNG', 'png', size=3))
+    recipe.save()
+    return recipe
+
+
+def test_variants_scheduled_on_image_change(
+        recipe, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks() as callbacks:
+        recipe.name = f'{recipe.name} 2'
+        recipe.save(update_fields=['name'])
+        Recipe.objects.get(pk=recipe.pk).save()
+        Recipe.objects.defer('image').get(pk=recipe.pk).save()
+        Recipe.objects.filter(pk=recipe.pk).update(favorites_count=1)
+    assert callbacks == []
+    with django_capture_on_commit_callbacks() as callbacks:
+        recipe.image = decode_base64_image(data_uri('PNG'))
+        recipe.save()
+        recipe.save()
+    assert len(callbacks) == 1
+
+
+def test_variant_urls_without_storage(api_client, recipe, monkeypatch):
+    storage = Recipe._meta.get_field('image').storage
+
+    def exists(name):
+        raise AssertionError('хранилище не должно опрашиваться')
+
+    monkeypatch.setattr(storage, 'exists', exists)
+    response = api_client.get(f'/api/recipes/{recipe.pk}/')
+    assert set(response.data['image_variants'].values()) == {
+        response.data['image']}
+    mark_variants_ready(recipe.image.name)
+    response = api_client.get(f'/api/recipes/{recipe.pk}/')
+    assert response.data['image_variants']['thumbnail'].endswith(
+        '_thumbnail.webp')
+
+
+def test_image_change_resets_variants(recipe):
+    mark_variants_ready(recipe.image.name)
+    recipe = Recipe.objects.get(pk=recipe.pk)
+    recipe.name = f'{recipe.name} 2'
+    recipe.save(update_fields=['name'])
+    assert Recipe.objects.get(pk=recipe.pk).has_image_variants
+    recipe.image = decode_base64_image(data_uri('PNG'))
+    recipe.save(update_fields=['image'])
+    assert not Recipe.objects.get(pk=recipe.pk).has_image_variants
@@ -0,0 +1,26 @@
+"""Потоковое чтение JSON в import_data."""
+import io
+import json
+
+import pytest
+
+from recipes.management.commands.import_data import iter_json_array
+
+ROWS = [
+    {'name': f'ингредиент "{index}" {"x" * index}', 'measurement_unit': 'г',
+     'amount': index * 1000}
+    for index in range(20)]
+
+
+@pytest.mark.parametrize('read_size', (1, 3, 16, 4096))
+@pytest.mark.parametrize('indent', (None, 2))
+def test_iter_json_array(read_size, indent):
+    text = json.dumps(ROWS, ensure_ascii=False, indent=indent)
+    assert list(iter_json_array(io.StringIO(text), read_size)) == ROWS
+
+
+@pytest.mark.parametrize('text', (
+    '', '{}', '[{"a": 1}', '[{"a": 1},]', '[{"a": 1} {"a": 2}]', '[{"a": }]'))
+def test_iter_json_array_invalid(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), 4))
@@ -0,0 +1,20 @@
+"""Подбор рецептов по имеющимся ингредиентам."""
+from recipes.models import Ingredient, Recipe
+from tests import factories
+
+
+def test_only_mode_skips_recipes_without_ingredients(
+        api_client, user, dataset):
+    ingredient = Ingredient.objects.create(
+        name='only-mode', measurement_unit='г')
+    path = f'/api/recipes/?ingredients={ingredient.pk}&ingredients_mode=only'
+    Recipe.objects.create(
+        author=user, name='Без ингредиентов', text='text', cooking_time=1,
+        image='recipes/empty.png')
+    response = api_client.get(path)
+    assert response.status_code == 200
+    assert response.data['results'] == []
+    recipe, = factories.create_recipes(
+        user, 1, dataset['tags'][:1], [ingredient], prefix='only-mode')
+    response = api_client.get(path)
+    assert [item['id'] for item in response.data['results']] == [recipe.pk]
@@ -0,0 +1,202 @@
+"""Бюджеты SQL-запросов и времени ответа для каждого маршрута API.
+
+Тест падает, если изменение добавило N+1, а также если в api/urls.py
+появился маршрут без бюджета. Время ответа на общих машинах CI
+нестабильно, поэтому превышение бюджета времени выводится
+предупреждением, а падение включает QUERY_BUDGET_ENFORCE_TIME=True.
+"""
+import os
+import time
+import warnings
+
+import pytest
+from django.urls import URLResolver, resolve
+
+from api.urls import urlpatterns
+from recipes import synthetic
+from recipes.models import Favorite, ShoppingCart
+from tests import factories
+from users.models import Subscription
+
+# маршруты djoser для сценариев с письмами, в проекте не используются
+IGNORED_ROUTES = {
+    'users-activation',
+    'users-resend-activation',
+    'users-reset-password',
+    'users-reset-password-confirm',
+    'users-reset-username',
+    'users-reset-username-confirm',
+    'users-set-username',
+}
+
+ENFORCE_TIME = os.getenv(
+    'QUERY_BUDGET_ENFORCE_TIME', 'False').lower() in ('true', '1', 't')
+
+# метод, путь, тело запроса из контекста, запросов к БД, мс
+BUDGETS = (
+    ('get', '/api/', None, 1, 100),
+    ('get', '/api/recipes/', None, 6, 300),
+    ('get', '/api/recipes/?pagination=cursor&limit=20', None, 5, 300),
+    ('get', '/api/recipes/?ordering=popular&tags={tag_slug}', None, 7, 300),
+    ('get', '/api/recipes/?is_favorited=1', None, 6, 300),
+    ('get', '/api/recipes/?tags={tag_slug}&tags={other_tag}&tags_mode=all',
+     None, 6, 300),
+    ('get', '/api/recipes/?search={search}', None, 6, 300),
+    ('get', '/api/recipes/?ingredients={ingredient_ids}&missing=2',
+     None, 6, 300),
+    ('post', '/api/recipes/', 'new_recipe', 15, 500),
+    ('get', '/api/recipes/{recipe}/', None, 5, 200),
+    ('patch', '/api/recipes/{own_recipe}/', 'recipe_update', 18, 500),
+    ('get', '/api/recipes/{recipe}/get-link/', None, 2, 100),
+    ('get', '/api/recipes/feed/', None, 5, 300),
+    ('post', '/api/recipes/{free_recipe}/favorite/', None, 7, 200),
+    ('delete', '/api/recipes/{favorite_recipe}/favorite/', None, 5, 200),
+    ('post', '/api/recipes/{free_recipe}/shopping_cart/', None, 8, 200),
+    ('delete', '/api/recipes/{cart_recipe}/shopping_cart/', None, 7, 200),
+    ('post', '/api/recipes/favorite/', 'recipe_ids', 7, 300),
+    ('delete', '/api/recipes/favorite/', 'favorite_ids', 6, 300),
+    ('post', '/api/recipes/shopping_cart/', 'recipe_ids', 10, 300),
+    ('delete', '/api/recipes/shopping_cart/', 'cart_ids', 10, 300),
+    ('get', '/api/recipes/download_shopping_cart/', None, 2, 300),
+    ('get', '/api/recipes/download_shopping_cart/?format=csv',
+     None, 2, 300),
+    ('get', '/api/shopping-list/', None, 2, 200),
+    ('delete', '/api/recipes/{deleted_recipe}/', None, 11, 500),
+    ('get', '/api/tags/', None, 2, 100),
+    ('get', '/api/tags/{tag}/', None, 2, 100),
+    ('get', '/api/ingredients/?name=synthetic', None, 2, 300),
+    ('get', '/api/ingredients/autocomplete/?name=ингредиент 1',
+     None, 2, 200),
+    ('get', '/api/ingredients/{ingredient}/', None, 2, 100),
+    ('get', '/api/users/', None, 3, 200),
+    ('post', '/api/users/', 'new_user', 6, 1000),
+    ('get', '/api/users/{author}/', None, 2, 100),
+    ('get', '/api/users/me/', None, 2, 100),
+    ('get', '/api/users/subscriptions/?recipes_limit=3', None, 4, 300),
+    ('post', '/api/users/{free_author}/subscribe/', None, 4, 200),
+    ('delete', '/api/users/{followed_author}/subscribe/', None, 5, 200),
+    ('put', '/api/users/me/avatar/', 'avatar', 2, 300),
+    ('delete', '/api/users/me/avatar/', None, 2, 200),
+    ('post', '/api/users/set_password/', 'password', 2, 1500),
+    ('post', '/api/auth/token/login/', 'credentials', 4, 1500),
+    ('post', '/api/auth/token/logout/', None, 3, 100),
+    ('get', '/api/metrics/', None, 1, 100),
+    ('get', '/api/docs/', None, 0, 100),
+)
+
+
+def route_names(patterns, prefix='', seen=None):
+    """Имена маршрутов, до которых доходит запрос.
+
+    Маршруты djoser.urls с теми же путями, что у UserViewSet,
+    перекрыты ими и пропускаются.
+    """
+    seen = set() if seen is None else seen
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from route_names(pattern.url_patterns, route, seen)
+        elif route not in seen and 'format' not in route:
+            seen.add(route)
+            if pattern.name:
+                yield pattern.name
+
+
+@pytest.fixture
+def user(db, dataset):
+    # персонал: /api/metrics/ доступен только администратору
+    return factories.create_user('budget', is_staff=True)
+
+
+@pytest.fixture
+def context(dataset, user):
+    tags, ingredients = dataset['tags'], dataset['ingredients']
+    recipes = [
+        recipe for recipe in dataset['recipes'] if recipe.author_id]
+    authors = list(dict.fromkeys(recipe.author for recipe in recipes))
+    Subscription.objects.bulk_create(
+        Subscription(user=user, author=author) for author in authors[:10])
+    Favorite.objects.add_recipes(
+        user, [recipe.pk for recipe in recipes[:20]])
+    ShoppingCart.objects.add_recipes(
+        user, [recipe.pk for recipe in recipes[20:30]])
+    own = factories.create_recipes(user, 2, tags, ingredients)
+    ingredient_amounts = [
+        {'id': ingredient.pk, 'amount': index + 1}
+        for index, ingredient in enumerate(ingredients[:10])]
+    return {
+        'recipe': recipes[40].pk,
+        'own_recipe': own[0].pk,
+        'deleted_recipe': own[1].pk,
+        'free_recipe': recipes[30].pk,
+        'favorite_recipe': recipes[0].pk,
+        'cart_recipe': recipes[20].pk,
+        'author': authors[0].pk,
+        'followed_author': authors[0].pk,
+        'free_author': authors[10].pk,
+        'tag': tags[0].pk,
+        'tag_slug': tags[0].slug,
+        'other_tag': tags[1].slug,
+        'search': ingredients[1].name,
+        'ingredient_ids': ','.join(
+            str(ingredient.pk) for ingredient in ingredients[:5]),
+        'ingredient': ingredients[0].pk,
+        'recipe_ids': {'recipes': [
+            recipe.pk for recipe in recipes[31:51]]},
+        'favorite_ids': {'recipes': [
+            recipe.pk for recipe in recipes[:20]]},
+        'cart_ids': {'recipes': [recipe.pk for recipe in recipes[20:30]]},
+        'new_recipe': {
+            'name': 'budget новый рецепт',
+            'text': 'Рецепт для проверки бюджета запросов',
+            'cooking_time': 10,
+            'image': synthetic.tiny_png_base64(),
+            'tags': [tag.pk for tag in tags[:2]],
+            'ingredients': ingredient_amounts},
+        'recipe_update': {
+            'name': 'budget изменённый рецепт',
+            'ingredients': ingredient_amounts[1:] + [
+                {'id': ingredients[20].pk, 'amount': 5}]},
+        'new_user': {
+            'email': 'budget-new@test.local',
+            'username': 'budget-new',
+            'first_name': 'budget',
+            'last_name': 'budget',
+            'password': synthetic.PASSWORD + '-new'},
+        'avatar': {'avatar': synthetic.tiny_png_base64()},
+        'password': {
+            'current_password': synthetic.PASSWORD,
+            'new_password': synthetic.PASSWORD + '-changed'},
+        'credentials': {
+            'email': user.email,
+            'password': synthetic.PASSWORD},
+    }
+
+
+def test_every_route_has_budget():
+    covered = {
+        resolve(path.split('?')[0]).url_name
+        for _, path, _, _, _ in BUDGETS}
+    assert set(route_names(urlpatterns)) - covered - IGNORED_ROUTES == set()
+
+
+@pytest.mark.parametrize(
+    'method, path, body, max_queries, max_ms',
+    BUDGETS,
+    ids=[f'{method.upper()} {path}' for method, path, *_ in BUDGETS])
+def test_route_budget(auth_client, context, django_assert_max_num_queries,
+                      method, path, body, max_queries, max_ms):
+    path = path.format(**context)
+    start = time.perf_counter()
+    with django_assert_max_num_queries(max_queries):
+        response = getattr(auth_client, method)(
+            path, context.get(body), format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+    elapsed = (time.perf_counter() - start) * 1000
+    assert response.status_code < 400, response.content
+    if ENFORCE_TIME:
+        assert elapsed <= max_ms
+    elif elapsed > max_ms:
+        warnings.warn(f'{method.upper()} {path}: {elapsed:.0f} мс '
+                      f'при бюджете {max_ms} мс')
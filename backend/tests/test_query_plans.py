@@ -0,0 +1,129 @@
+"""Запросы списка рецептов с фильтрами используют индексы.
+
+Планы проверяются через EXPLAIN на общих данных сессии: без полного
+чтения больших таблиц и без DISTINCT по строкам рецептов.
+"""
+import json
+
+import pytest
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User
+
+# таблицы, которые запрос страницы не должен читать целиком; COUNT по
+# нечастому фильтру планировщик вправе считать полным чтением
+LARGE_TABLES = {
+    Recipe._meta.db_table,
+    Recipe.tags.through._meta.db_table,
+    Favorite._meta.db_table,
+    ShoppingCart._meta.db_table,
+}
+
+# фильтр RecipesFilter, индексы и таблицы, которые план читает по индексу
+PLANS = (
+    ('/api/recipes/', {'recipe_pub_date_id_idx'}),
+    ('/api/recipes/?author={author}', {'recipe_author_pub_date_idx'}),
+    ('/api/recipes/?tags={tag}', {'recipe_tags_tag_recipe_idx'}),
+    ('/api/recipes/?tags={tag}&tags={other_tag}',
+     {'recipe_tags_tag_recipe_idx'}),
+    ('/api/recipes/?tags={tag}&tags={other_tag}&tags_mode=all',
+     {'recipe_tags_tag_recipe_idx'}),
+    ('/api/recipes/?author={author}&tags={tag}',
+     {'recipe_author_pub_date_idx', 'recipes_recipe_tags'}),
+    ('/api/recipes/?is_favorited=1', {'recipes_favorite'}),
+    ('/api/recipes/?is_favorited=1&tags={tag}',
+     {'recipes_favorite', 'recipes_recipe_tags'}),
+    ('/api/recipes/?is_in_shopping_cart=1', {'recipes_shoppingcart'}),
+    ('/api/recipes/?is_in_shopping_cart=1&is_favorited=1',
+     {'recipes_favorite', 'recipes_shoppingcart'}),
+    ('/api/recipes/?search={search}', {'recipe_search_idx'}),
+    ('/api/recipes/?search={search}&tags={tag}', {'recipes_recipe_tags'}),
+    ('/api/recipes/?ingredients={ingredient_ids}',
+     {'recipe_ingredient_ids_idx'}),
+    ('/api/recipes/?ingredients={ingredient_ids}&missing=2',
+     {'recipe_ingredient_ids_idx'}),
+    ('/api/recipes/?ingredients={ingredient_ids}&ingredients_mode=all',
+     {'recipe_ingredient_ids_idx'}),
+    ('/api/recipes/?ingredients={ingredient_ids}&ingredients_mode=any',
+     {'recipe_ingredient_ids_idx'}),
+)
+
+
+def plan_nodes(plan):
+    """Обходит все узлы плана из EXPLAIN (FORMAT JSON)."""
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan, = cursor.fetchone()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def recipe_queries(queries):
+    """Запросы к рецептам среди всех запросов ответа: COUNT и страница."""
+    return [
+        query['sql'] for query in queries
+        if query['sql'].startswith('SELECT')
+        and f'FROM "{Recipe._meta.db_table}"' in query['sql']]
+
+
+@pytest.fixture
+def context(dataset, db):
+    authors = list(User.objects.filter(recipes_count__gt=0).order_by(
+        'recipes_count').values_list('pk', flat=True))
+    return {
+        'author': authors[len(authors) // 2],
+        'tag': dataset['tags'][0].slug,
+        'other_tag': dataset['tags'][1].slug,
+        # синтетические названия различаются только номером
+        'search': dataset['ingredients'][7].name.split()[-1],
+        'ingredient_ids': ','.join(
+            str(ingredient.pk) for ingredient in dataset['ingredients'][:5]),
+    }
+
+
+@pytest.fixture
+def client(db, dataset):
+    """Клиент пользователя с самым большим избранным."""
+    user = User.objects.annotate(
+        favorites_total=Count('favorites')).order_by(
+        '-favorites_total').first()
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.mark.parametrize('path, expected', PLANS, ids=[
+    path for path, _ in PLANS])
+def test_query_plan(client, context, path, expected):
+    path = path.format(**context)
+    with CaptureQueriesContext(connection) as captured:
+        response = client.get(path)
+    assert response.status_code == 200
+    queries = recipe_queries(captured.captured_queries)
+    assert queries
+    indexes, tables, scanned = set(), set(), set()
+    for sql in queries:
+        assert 'SELECT DISTINCT' not in sql
+        is_count = sql.startswith('SELECT COUNT(')
+        for node in plan_nodes(explain(sql)):
+            if node['Node Type'] == 'Seq Scan' and not is_count:
+                scanned.add(node['Relation Name'])
+            elif 'Index Name' in node:
+                indexes.add(node['Index Name'])
+            if 'Relation Name' in node and node['Node Type'] != 'Seq Scan':
+                tables.add(node['Relation Name'])
+    assert not expected - indexes - tables, indexes
+    assert not scanned & LARGE_TABLES
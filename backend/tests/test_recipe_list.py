@@ -0,0 +1,60 @@
+"""Число запросов списка рецептов не зависит от размера страницы."""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.pagination import PageNumberPagination
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription
+
+PAGE_SIZES = (1, 10, 50)
+PATHS = (
+    '/api/recipes/?pagination=cursor&limit={size}',
+    '/api/recipes/feed/?limit={size}',
+)
+
+
+@pytest.fixture
+def user(user, dataset):
+    """Подписки, избранное и корзина, чтобы флаги на странице различались."""
+    authors = Recipe.objects.values_list('author', flat=True).order_by(
+        '-author__recipes_count').distinct()[:20]
+    Subscription.objects.bulk_create(
+        Subscription(user=user, author_id=author) for author in authors)
+    recipes = list(Recipe.objects.values_list('pk', flat=True)[:50])
+    Favorite.objects.add_recipes(user, recipes[::2])
+    ShoppingCart.objects.add_recipes(user, recipes[::3])
+    return user
+
+
+def query_counts(client, path):
+    counts = []
+    for size in PAGE_SIZES:
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(path.format(size=size))
+        assert response.status_code == 200
+        assert len(response.data['results']) == size
+        counts.append(len(captured))
+    return counts
+
+
+@pytest.mark.parametrize('path', PATHS)
+def test_query_count_constant(auth_client, path):
+    counts = query_counts(auth_client, path)
+    assert counts == [counts[0]] * len(counts)
+
+
+def test_query_count_constant_anonymous(api_client):
+    counts = query_counts(api_client, PATHS[0])
+    assert counts == [counts[0]] * len(counts)
+
+
+def test_query_count_constant_page_number(auth_client, monkeypatch):
+    counts = []
+    for size in PAGE_SIZES:
+        monkeypatch.setattr(PageNumberPagination, 'page_size', size)
+        with CaptureQueriesContext(connection) as captured:
+            response = auth_client.get('/api/recipes/')
+        assert len(response.data['results']) == size
+        counts.append(len(captured))
+    assert counts == [counts[0]] * len(counts)
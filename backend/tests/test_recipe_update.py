@@ -0,0 +1,57 @@
+"""Число запросов PATCH рецепта: без изменений и с одним полем."""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Ingredient, IngredientInRecipe, Tag
+from tests import factories
+
+# ингредиентов в рецепте: число запросов от него не зависит
+SIZES = (1, 10, 100)
+# запросов при PATCH без изменений и при изменении одного поля
+NOOP_QUERIES = 13
+SINGLE_FIELD_QUERIES = 16
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+@pytest.fixture
+def recipe(user):
+    tag = Tag.objects.order_by('pk').first()
+    ingredients = list(Ingredient.objects.order_by('pk')[:1])
+    return factories.create_recipes(user, 1, [tag], ingredients)[0]
+
+
+def patch(client, recipe, size, **fields):
+    """PATCH с текущими тегами и первыми size ингредиентами."""
+    ingredients = list(
+        Ingredient.objects.order_by('pk').values_list('pk', flat=True)[:size])
+    IngredientInRecipe.objects.filter(recipe=recipe).delete()
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient_id=pk, amount=1)
+        for pk in ingredients)
+    body = {
+        'tags': list(recipe.tags.values_list('pk', flat=True)),
+        'ingredients': [{'id': pk, 'amount': 1} for pk in ingredients],
+        **fields,
+    }
+    with CaptureQueriesContext(connection) as captured:
+        response = client.patch(
+            f'/api/recipes/{recipe.pk}/', body, format='json')
+    assert response.status_code == 200, response.data
+    return [query['sql'] for query in captured]
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_noop_patch(auth_client, recipe, size):
+    queries = patch(auth_client, recipe, size)
+    assert len(queries) == NOOP_QUERIES
+    assert not [sql for sql in queries if sql.startswith(WRITES)]
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_single_field_patch(auth_client, recipe, size):
+    queries = patch(auth_client, recipe, size, name=f'{recipe.name} 2')
+    assert len(queries) == SINGLE_FIELD_QUERIES
+    # само поле и поисковые поля после смены названия
+    updates = [sql for sql in queries if sql.startswith('UPDATE')]
+    assert len(updates) == 2, updates
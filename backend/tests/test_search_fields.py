@@ -0,0 +1,66 @@
+"""Поисковые поля рецепта: загрузка и пересчёт."""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Ingredient, Recipe
+from tests import factories
+
+PATHS = (
+    '/api/recipes/',
+    '/api/recipes/{recipe}/',
+    '/api/recipes/feed/',
+    '/api/users/subscriptions/',
+)
+
+
+@pytest.fixture
+def recipe(dataset, db):
+    return Recipe.objects.filter(ingredient_ids__len__gt=1).first()
+
+
+@pytest.mark.parametrize('path', PATHS)
+def test_read_skips_search_fields(auth_client, user, recipe, path):
+    user.follower.create(author=recipe.author)
+    with CaptureQueriesContext(connection) as captured:
+        response = auth_client.get(path.format(recipe=recipe.pk))
+    assert response.status_code == 200
+    selects = [
+        query['sql'] for query in captured
+        if f'FROM "{Recipe._meta.db_table}"' in query['sql']]
+    assert selects
+    for sql in selects:
+        for field in Recipe.search_fields:
+            assert f'"{Recipe._meta.db_table}"."{field}"' not in sql
+
+
+def test_ingredient_delete_updates_recipes(recipe):
+    pk = recipe.ingredient_ids[0]
+    recipes = Recipe.objects.filter(ingredients=pk)
+    assert recipes.exists()
+    expected = {
+        recipe_pk: [value for value in ingredient_ids if value != pk]
+        for recipe_pk, ingredient_ids in recipes.values_list(
+            'pk', 'ingredient_ids')}
+    Ingredient.objects.get(pk=pk).delete()
+    assert dict(Recipe.objects.filter(pk__in=expected).values_list(
+        'pk', 'ingredient_ids')) == expected
+
+
+def test_ingredient_rename_updates_recipes(
+        api_client, user, dataset, django_capture_on_commit_callbacks):
+    ingredient = Ingredient.objects.create(
+        name='zanzibarpepper', measurement_unit='г')
+    recipe, = factories.create_recipes(
+        user, 1, dataset['tags'][:1], [ingredient], prefix='rename')
+    ingredient = Ingredient.objects.get(pk=ingredient.pk)
+    with django_capture_on_commit_callbacks() as callbacks:
+        ingredient.save()
+    assert callbacks == []
+    ingredient.name = 'madagascarvanilla'
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        ingredient.save()
+    assert len(callbacks) == 1
+    response = api_client.get('/api/recipes/?search=madagascarvanilla')
+    assert [item['id'] for item in response.json()['results']] == [
+        recipe.pk]
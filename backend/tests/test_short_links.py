@@ -0,0 +1,70 @@
+"""Переход по коротким ссылкам рецептов."""
+import pytest
+from django.core.cache import cache
+from django.test import Client
+
+from api.metrics import snapshot
+from api.short_links import decode, encode
+from recipes.models import Recipe
+
+
+@pytest.fixture
+def client(db, dataset):
+    cache.clear()
+    return Client()
+
+
+@pytest.fixture
+def recipe(db, dataset):
+    return Recipe.objects.order_by('pk').first()
+
+
+@pytest.mark.parametrize('method', ('get', 'head'))
+def test_redirect(client, recipe, method):
+    response = getattr(client, method)(f'/s/{encode(recipe.pk)}/')
+    assert response.status_code == 302
+    assert response['Location'] == f'/recipes/{recipe.pk}/'
+
+
+def test_post_not_allowed(client, recipe):
+    assert client.post(f'/s/{encode(recipe.pk)}/').status_code == 405
+
+
+def test_unknown_code(client):
+    assert client.get('/s/0000000/').status_code == 404
+
+
+def test_deleted_recipe_cached_link(client, recipe,
+                                    django_assert_num_queries):
+    path = f'/s/{encode(recipe.pk)}/'
+    assert client.get(path).status_code == 302
+    with django_assert_num_queries(0):
+        assert client.get(path).status_code == 302
+    recipe.delete()
+    assert client.get(path).status_code == 404
+
+
+def test_metrics_label(recipe, settings):
+    settings.REQUEST_METRICS = True
+    Client().get(f'/s/{encode(recipe.pk)}/')
+    views = snapshot()['views']
+    assert views['GET get_short_link']['requests'] >= 1
+    assert 'GET unresolved' not in views
+
+
+def test_legacy_link(client, recipe, settings):
+    settings.SHORT_LINK_LEGACY_MAX_ID = recipe.pk
+    response = client.get(f'/s/{recipe.pk}/')
+    assert response.status_code == 302
+    assert response['Location'] == f'/recipes/{recipe.pk}/'
+    assert client.get(f'/s/0{recipe.pk}/').status_code == 404
+
+
+def test_legacy_link_after_codes(client, recipe, settings):
+    settings.SHORT_LINK_LEGACY_MAX_ID = recipe.pk - 1
+    assert client.get(f'/s/{recipe.pk}/').status_code == 404
+
+
+def test_digit_code_is_not_legacy_id(settings):
+    settings.SHORT_LINK_LEGACY_MAX_ID = 10 ** 9
+    assert encode(decode('1234567')) == '1234567'
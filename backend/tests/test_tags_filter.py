@@ -0,0 +1,24 @@
+"""Фильтр по тегам при устаревшем кэше тегов процесса."""
+from api.cache import tag_ids_by_slug
+from recipes.models import Recipe, Tag
+
+
+def test_tag_added_in_other_process(api_client, dataset):
+    recipe = Recipe.objects.order_by('pk').first()
+    assert api_client.get('/api/recipes/?tags=fresh').status_code == 400
+    # bulk_create не вызывает сигналы и не меняет версию кэша тегов,
+    # как тег, добавленный в другом процессе с локальным кэшем
+    tag, = Tag.objects.bulk_create([
+        Tag(name='fresh', slug='fresh')])
+    assert 'fresh' not in tag_ids_by_slug()
+    recipe.tags.add(tag)
+    response = api_client.get('/api/recipes/?tags=fresh')
+    assert response.status_code == 200
+    assert [item['id'] for item in response.data['results']] == [recipe.pk]
+
+
+def test_unknown_tag(api_client, dataset):
+    response = api_client.get(
+        f'/api/recipes/?tags={dataset["tags"][0].slug}&tags=missing')
+    assert response.status_code == 400
+    assert 'tags' in response.data
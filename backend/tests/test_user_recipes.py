@@ -0,0 +1,42 @@
+"""Массовое добавление в избранное и корзину учитывает рецепт один раз."""
+import pytest
+from django.db.models import Sum
+
+from recipes.models import (Favorite, IngredientInRecipe, Recipe,
+                            ShoppingCart, ShoppingListItem)
+
+
+@pytest.fixture
+def recipe_ids(dataset, db):
+    return list(Recipe.objects.order_by('pk').values_list('pk', flat=True)[:5])
+
+
+def counters(model, recipe_ids):
+    return dict(Recipe.objects.filter(pk__in=recipe_ids).values_list(
+        'pk', model.counter_field))
+
+
+@pytest.mark.parametrize('model', (Favorite, ShoppingCart))
+def test_add_recipes_counts_inserted_rows(user, recipe_ids, model):
+    before = counters(model, recipe_ids)
+    created, existing = model.objects.add_recipes(user, recipe_ids[:3])
+    assert created == recipe_ids[:3]
+    assert existing == set()
+    # повтор и пересечение с уже добавленными, в том числе дубли в запросе
+    created, existing = model.objects.add_recipes(
+        user, recipe_ids[2:] + recipe_ids[:1])
+    assert created == recipe_ids[3:]
+    assert existing == {recipe_ids[0], recipe_ids[2]}
+    assert counters(model, recipe_ids) == {
+        pk: count + 1 for pk, count in before.items()}
+    assert model.objects.filter(user=user).count() == len(recipe_ids)
+
+
+def test_add_recipes_shopping_list(user, recipe_ids):
+    ShoppingCart.objects.add_recipes(user, recipe_ids[:3])
+    ShoppingCart.objects.add_recipes(user, recipe_ids)
+    expected = dict(IngredientInRecipe.objects.filter(
+        recipe__in=recipe_ids).values('ingredient').annotate(
+        total=Sum('amount')).values_list('ingredient', 'total'))
+    assert dict(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient', 'total')) == expected
@@ -1,7 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
-from recipes.models import Favorite
 from users.models import Subscription, User
 
 
@@ -13,14 +12,12 @@ class UserAdmin(UserAdmin):
         'email',
         'first_name',
         'last_name',
-        'favorite_count',
+        'recipes_count',
+        'followers_count',
         'avatar')
     list_filter = ('email', 'first_name')
     empty_value_display = '-empty-'
 
-    def favorite_count(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
-
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.3 on 2026-10-18 03:38
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    for field, related in (
+        ('recipes_count', apps.get_model('recipes', 'Recipe')),
+        ('followers_count', apps.get_model('users', 'Subscription')),
+    ):
+        User.objects.update(**{field: Coalesce(Subquery(
+            related.objects.filter(author=OuterRef('pk')).order_by().values(
+                'author').annotate(total=Count('pk')).values('total')), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_managers'),
+        ('recipes', '0011_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
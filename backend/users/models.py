@@ -1,7 +1,9 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import UserManager as DjangoUserManager
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxLengthValidator, RegexValidator
 from django.db import models
+from django.db.models import BooleanField, Exists, OuterRef, Value
 
 from api.constants import (
     MAX_EMAIL_LENGTH,
@@ -10,6 +12,22 @@ from api.constants import (
 )
 
 
+class UserQuerySet(models.QuerySet):
+    """Запросы к пользователям с аннотациями для сериализаторов."""
+
+    def with_is_subscribed(self, user):
+        """Аннотирует флаг подписки текущего пользователя на автора."""
+        if user is None or not user.is_authenticated:
+            return self.annotate(
+                is_subscribed=Value(False, output_field=BooleanField()))
+        return self.annotate(is_subscribed=Exists(
+            Subscription.objects.filter(user=user, author=OuterRef('pk'))))
+
+
+class UserManager(DjangoUserManager.from_queryset(UserQuerySet)):
+    """Менеджер пользователей с методами UserQuerySet."""
+
+
 class User(AbstractUser):
     """Описание модели пользователя."""
 
@@ -41,6 +59,18 @@ class User(AbstractUser):
         default=None,
         upload_to='media/avatars/',
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False
+    )
+
+    objects = UserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name', 'avatar']
@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes.models import Recipe
+from recipes.signals import change_counter, change_counters, deleting
+from users.models import Subscription, User
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    users = deleting(User)
+    if instance.user_id in users or instance.author_id in users:
+        return
+    change_counter(User, instance.author_id, 'followers_count', -1)
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    """Уменьшает счётчики по избранному, корзине и подпискам пользователя.
+
+    Каждый счётчик меняется одним UPDATE, а не по строке на каждую
+    каскадно удаляемую запись.
+    """
+    deleting(User).add(instance.pk)
+    change_counters(
+        Recipe.objects.filter(favorites__user=instance),
+        'favorites_count', -1)
+    change_counters(
+        Recipe.objects.filter(shopping_cart__user=instance),
+        'in_carts_count', -1)
+    change_counters(
+        User.objects.filter(following_author__user=instance),
+        'followers_count', -1)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    deleting(User).discard(instance.pk)